@@ -0,0 +1,215 @@
+from sqlalchemy import select, update, insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import List, Optional
+import argparse
+import os
+import sys
+import time
+
+from models import Matter, TimeEntry, Invoice
+from models import MatterType as MatterTypeDB
+from pdf_cache import cached_pdf
+from pdf_service import pdf_service
+import changes
+import ledger
+import reports
+import rollups
+import sequences
+
+# Month-end billing: one invoice per matter for all unbilled billable time in a period.
+#
+# Matters are invoiced BILLING_CHUNK_SIZE at a time, each chunk in its own transaction:
+# the candidate entries are locked, invoice numbers are taken as one block from the
+# counter, invoices are inserted with a single executemany INSERT ... RETURNING, the locked
+# entries are marked billed with one UPDATE per invoice, and matter totals and client ledgers
+# are updated with one executemany each. A failure rolls back only the chunk it happened in.
+# PDFs are rendered once everything is committed, through the PDF worker pool, straight into
+# the PDF cache.
+
+VAT_RATE = 0.24
+BILLING_CHUNK_SIZE = int(os.getenv("BILLING_CHUNK_SIZE", "100"))
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def unbilled_filter(start: date, end: date):
+    return (TimeEntry.billable == True, TimeEntry.billed == False, TimeEntry.date >= start, TimeEntry.date <= end)
+
+def candidate_matters(db: Session, start: date, end: date, client_id: Optional[int] = None, matter_type: Optional[str] = None) -> List[int]:
+    """Matters with unbilled billable time in the period, in id order"""
+    stmt = select(TimeEntry.matter_id).where(*unbilled_filter(start, end)).distinct().order_by(TimeEntry.matter_id)
+    if client_id is not None or matter_type is not None:
+        stmt = stmt.join(Matter, Matter.id == TimeEntry.matter_id)
+        if client_id is not None:
+            stmt = stmt.where(Matter.client_id == client_id)
+        if matter_type is not None:
+            stmt = stmt.where(Matter.matter_type == MatterTypeDB[matter_type])
+    return list(db.scalars(stmt))
+
+def invoice_chunk(db: Session, matter_ids: List[int], start: date, end: date, issue_date: date, due_date: date, notes: Optional[str] = None) -> List[dict]:
+    """Invoice the given matters in one transaction; returns one summary dict per invoice"""
+    with sequences.serialized(db):
+        # Lock the entries so a concurrent run cannot bill them twice (FOR UPDATE is a no-op on SQLite)
+        entries = db.execute(
+            select(TimeEntry.id, TimeEntry.matter_id, Matter.client_id, TimeEntry.hours, TimeEntry.rate)
+            .join(Matter, Matter.id == TimeEntry.matter_id)
+            .where(*unbilled_filter(start, end), TimeEntry.matter_id.in_(matter_ids))
+            .with_for_update(of=TimeEntry)
+        ).all()
+        per_matter, client_of = {}, {}
+        for _, matter_id, client_id, hours, rate in entries:
+            count, subtotal = per_matter.get(matter_id, (0, 0.0))
+            per_matter[matter_id] = (count + 1, subtotal + hours * rate)
+            client_of[matter_id] = client_id
+        if not per_matter:
+            db.rollback()
+            return []
+        matter_order = sorted(per_matter)
+        numbers = sequences.next_numbers(db, "invoice", issue_date.year, len(matter_order))
+        rows = []
+        for matter_id, number in zip(matter_order, numbers):
+            subtotal = per_matter[matter_id][1]
+            vat_amount = subtotal * VAT_RATE
+            rows.append({
+                "invoice_number": number, "matter_id": matter_id, "issue_date": issue_date, "due_date": due_date,
+                "subtotal": subtotal, "vat_rate": VAT_RATE, "vat_amount": vat_amount, "total": subtotal + vat_amount,
+                "status": "draft", "notes": notes,
+            })
+        created = db.execute(
+            insert(Invoice).returning(Invoice.id, Invoice.matter_id, sort_by_parameter_order=True), rows
+        ).all()
+        invoice_ids = {matter_id: invoice_id for invoice_id, matter_id in created}
+
+        # Bill exactly the locked entries: re-filtering by matter and period would also catch
+        # entries committed since the SELECT, which the invoice totals do not include
+        entry_ids = {}
+        for entry in entries:
+            entry_ids.setdefault(entry.matter_id, []).append(entry.id)
+        conn = db.connection()
+        for matter_id in matter_order:
+            conn.execute(
+                update(TimeEntry.__table__).where(TimeEntry.id.in_(entry_ids[matter_id]))
+                .values(billed=True, invoice_id=invoice_ids[matter_id])
+            )
+        rollups.apply_invoices(db, {matter_id: per_matter[matter_id][1] for matter_id in matter_order})
+        ledger.record_invoices(db, [
+            {"client_id": client_of[row["matter_id"]], "subtotal": row["subtotal"], "total": row["total"], "issue_date": issue_date}
+            for row in rows
+        ])
+        changes.record(db, "time_entry", [entry.id for entry in entries])
+        changes.record(db, "invoice", invoice_ids.values())
+        db.commit()
+    return [
+        {
+            "invoice_id": invoice_ids[row["matter_id"]], "invoice_number": row["invoice_number"], "matter_id": row["matter_id"],
+            "entry_count": per_matter[row["matter_id"]][0], "subtotal": row["subtotal"], "total": row["total"],
+        }
+        for row in rows
+    ]
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PDF RENDERING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def invoice_pdf_fields(invoice: Invoice) -> dict:
+    """InvoicePDF.generate() arguments for an invoice loaded with its matter, client and entries"""
+    line_items = [
+        {"date": e.date, "description": e.description, "hours": e.hours, "rate": e.rate, "amount": e.hours * e.rate}
+        for e in sorted(invoice.time_entries, key=lambda e: (e.date, e.id))
+    ]
+    return dict(
+        invoice_number=invoice.invoice_number, issue_date=invoice.issue_date, due_date=invoice.due_date,
+        client_name=invoice.matter.client.name, client_address=invoice.matter.client.address,
+        client_business_id=invoice.matter.client.business_id, matter_reference=invoice.matter.reference,
+        matter_title=invoice.matter.title, line_items=line_items, subtotal=invoice.subtotal,
+        vat_rate=invoice.vat_rate, vat_amount=invoice.vat_amount, total=invoice.total, notes=invoice.notes
+    )
+
+def load_invoices(db: Session, invoice_ids: List[int]) -> List[Invoice]:
+    return db.query(Invoice).options(
+        selectinload(Invoice.time_entries), joinedload(Invoice.matter).joinedload(Matter.client)
+    ).filter(Invoice.id.in_(invoice_ids)).order_by(Invoice.id).all()
+
+def render_pdfs(db: Session, invoice_ids: List[int]) -> tuple:
+    """Render invoices into the PDF cache in parallel; returns (rendered count, error messages)"""
+    jobs = []
+    for chunk in _chunks(invoice_ids, BILLING_CHUNK_SIZE):
+        jobs += [(invoice.id, invoice.invoice_number, invoice_pdf_fields(invoice)) for invoice in load_invoices(db, chunk)]
+    rendered, errors = 0, []
+    # Threads only wait on the process pool; keep a couple of jobs queued per worker
+    with ThreadPoolExecutor(max_workers=max(pdf_service.workers, 1) * 2) as pool:
+        futures = {
+            pool.submit(cached_pdf, f"invoice-{invoice_id}", fields, lambda fields=fields: pdf_service.render("invoice", fields)): number
+            for invoice_id, number, fields in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                rendered += 1
+            except Exception as e:
+                errors.append(f"{futures[future]}: {getattr(e, 'detail', e)}")
+    return rendered, sorted(errors)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BATCH RUN
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def run(db: Session, start: date, end: date, client_id: Optional[int] = None, matter_type: Optional[str] = None,
+        due_days: int = 14, notes: Optional[str] = None, render: bool = True) -> dict:
+    """Invoice every matter with unbilled time between start and end (inclusive)"""
+    started = time.perf_counter()
+    issue_date = date.today()
+    due_date = issue_date + timedelta(days=due_days)
+    matter_ids = candidate_matters(db, start, end, client_id, matter_type)
+    db.rollback()  # Do not hold the read transaction open across the chunks
+    invoices, errors = [], []
+    for chunk in _chunks(matter_ids, BILLING_CHUNK_SIZE):
+        try:
+            invoices += invoice_chunk(db, chunk, start, end, issue_date, due_date, notes)
+        except Exception as e:
+            db.rollback()
+            errors.append(f"matters {chunk[0]}-{chunk[-1]}: {e}")
+    if invoices:
+        reports.invalidate_dashboard()
+    rendered, pdf_errors = render_pdfs(db, [i["invoice_id"] for i in invoices]) if render and invoices else (0, [])
+    return {
+        "start_date": start, "end_date": end, "invoices": invoices,
+        "invoice_count": len(invoices), "entry_count": sum(i["entry_count"] for i in invoices),
+        "subtotal": sum(i["subtotal"] for i in invoices), "total": sum(i["total"] for i in invoices),
+        "errors": errors, "pdfs_rendered": rendered, "pdf_errors": pdf_errors,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    import migrations
+
+    parser = argparse.ArgumentParser(description="Invoice all unbilled billable time in a period")
+    parser.add_argument("start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    parser.add_argument("--client-id", type=int)
+    parser.add_argument("--matter-type", choices=[t.name for t in MatterTypeDB])
+    parser.add_argument("--due-days", type=int, default=14)
+    parser.add_argument("--notes")
+    parser.add_argument("--no-pdf", action="store_true", help="skip rendering PDFs into the cache")
+    args = parser.parse_args()
+    if args.start > args.end:
+        sys.exit("start must not be after end")
+
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        report = run(db, args.start, args.end, args.client_id, args.matter_type, args.due_days, args.notes, not args.no_pdf)
+    finally:
+        db.close()
+        pdf_service.shutdown()
+    for invoice in report["invoices"]:
+        print(f"{invoice['invoice_number']}  matter {invoice['matter_id']:>6}  {invoice['entry_count']:>4} entries  {invoice['total']:>12.2f}")
+    for error in report["errors"]:
+        print(f"Failed: {error}")
+    for error in report["pdf_errors"]:
+        print(f"PDF failed: {error}")
+    print(f"{report['invoice_count']} invoices, {report['entry_count']} entries, total {report['total']:.2f} in {report['duration_seconds']}s")
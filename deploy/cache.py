@@ -0,0 +1,52 @@
+import threading
+import time
+
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after `ttl` seconds"""
+    
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+        self.generation = 0  # Bumped by invalidate(); lets a slow fill notice it went stale
+    
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+    
+    def set(self, key, value, generation=None):
+        """Store value; given the generation read before computing it, skip if invalidated since"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if len(self._data) >= self.maxsize and key not in self._data:
+                # Drop the entry closest to expiry to make room
+                del self._data[min(self._data, key=lambda k: self._data[k][0])]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+    
+    def get_or_set(self, key, factory):
+        generation = self.generation
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value, generation)
+        return value
+    
+    def invalidate(self, key=None):
+        """Drop one key, or everything when no key is given"""
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
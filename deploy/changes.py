@@ -0,0 +1,157 @@
+from sqlalchemy import event, select, insert, delete, func, inspect, literal, false
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Iterable
+import os
+import sys
+
+from models import Client, Matter, TimeEntry, Invoice, Document, ChangeLogEntry, NumberSequence
+import sequences
+
+# Change log for incremental sync (GET /api/sync?since=<token>).
+#
+# Every create, update and delete of a client, matter, time entry, invoice or document
+# appends a row to change_log in the same transaction as the write: ORM writes are collected
+# by the after_flush hook below, bulk paths (imports, billing) call record(). Deletes leave a
+# tombstone row. The row id is the sync token, so "what changed since" is a primary key
+# range scan. A time entry change also logs its matter, whose totals it moves.
+#
+# The token is only safe if ids follow commit order: a reader that sees id 105 must not be
+# able to miss an id 100 that commits later. So the rows are written just before commit,
+# with ids taken from the ("change_log", 0) counter in number_sequences. Taking them locks
+# the counter row until the transaction ends (see sequences.py), so the next writer gets
+# its ids only after this one has committed. On SQLite the single writer gives the same
+# order. The cost is that committing write transactions queue on that row for the moment
+# between writing their log rows and committing.
+
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+COUNTER = ("change_log", 0)  # number_sequences key handing out change_log ids
+_PENDING = "change_log_pending"  # Session.info key: changes of the open transaction
+
+TRACKED = {Client: "client", Matter: "matter", TimeEntry: "time_entry", Invoice: "invoice", Document: "document"}
+ENTITY_TYPES = tuple(TRACKED.values())
+
+def record(db: Session, entity_type: str, ids: Iterable[int], deleted: bool = False):
+    """Log changes made without the ORM unit of work; written when the caller commits"""
+    _pending(db).update({(entity_type, entity_id): deleted for entity_id in ids})
+
+def _pending(session: Session) -> dict:
+    return session.info.setdefault(_PENDING, {})
+
+def _write(session: Session, keys: dict):
+    name, year = COUNTER
+    last = sequences.next_value(session, name, year, len(keys))
+    now = datetime.now(timezone.utc)
+    session.connection().execute(insert(ChangeLogEntry), [
+        {"id": entry_id, "entity_type": entity_type, "entity_id": entity_id, "deleted": deleted, "changed_at": now}
+        for entry_id, ((entity_type, entity_id), deleted) in enumerate(sorted(keys.items()), start=last - len(keys) + 1)
+    ])
+
+def _log_matters_of(keys: dict, entry: TimeEntry):
+    matter_ids = {entry.matter_id, *inspect(entry).attrs.matter_id.history.deleted}
+    for matter_id in matter_ids:
+        if matter_id is not None:
+            keys.setdefault(("matter", matter_id), False)
+
+@event.listens_for(Session, "after_flush")
+def _log_on_flush(session: Session, flush_context):
+    keys = {}
+    for obj in session.new:
+        if type(obj) in TRACKED:
+            keys[(TRACKED[type(obj)], obj.id)] = False
+    for obj in session.dirty:
+        if type(obj) in TRACKED and session.is_modified(obj, include_collections=False):
+            keys[(TRACKED[type(obj)], obj.id)] = False
+    for obj in session.deleted:
+        if type(obj) in TRACKED:
+            keys[(TRACKED[type(obj)], obj.id)] = True
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if type(obj) is TimeEntry and (TRACKED[TimeEntry], obj.id) in keys:
+            _log_matters_of(keys, obj)
+    if keys:
+        _pending(session).update(keys)
+
+@event.listens_for(Session, "before_commit")
+def _write_on_commit(session: Session):
+    session.flush()  # commit() would flush after this hook; its changes belong in the log too
+    keys = session.info.pop(_PENDING, None)
+    if keys:
+        _write(session, keys)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop(_PENDING, None)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# READING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def current_token(db: Session) -> int:
+    """Token to start syncing from after a full load read in the same session"""
+    return db.scalar(select(func.max(ChangeLogEntry.id))) or 0
+
+def changes_since(db: Session, since: int, limit: int = SYNC_PAGE_SIZE) -> dict:
+    """Entities changed after token `since`, oldest first, at most `limit` log rows.
+
+    Returns {"token", "more", "changed": {type: [ids]}, "deleted": {type: [ids]}}; the last
+    change to an entity within the page decides whether it is changed or deleted.
+    """
+    rows = db.execute(
+        select(ChangeLogEntry.id, ChangeLogEntry.entity_type, ChangeLogEntry.entity_id, ChangeLogEntry.deleted)
+        .where(ChangeLogEntry.id > since).order_by(ChangeLogEntry.id).limit(limit + 1)
+    ).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    token = rows[-1].id if rows else since
+    latest = {}
+    for row in rows:
+        latest[(row.entity_type, row.entity_id)] = row.deleted
+    changed = {entity_type: [] for entity_type in ENTITY_TYPES}
+    deleted = {entity_type: [] for entity_type in ENTITY_TYPES}
+    for (entity_type, entity_id), is_deleted in latest.items():
+        (deleted if is_deleted else changed)[entity_type].append(entity_id)
+    return {"token": token, "more": more, "changed": changed, "deleted": deleted}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAINTENANCE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def log_existing(conn: Connection) -> int:
+    """One entry per existing record, so that since=0 covers data from before the log existed"""
+    now = datetime.now(timezone.utc)
+    count = 0
+    for model, entity_type in TRACKED.items():
+        count += conn.execute(insert(ChangeLogEntry).from_select(
+            ["entity_type", "entity_id", "deleted", "changed_at"],
+            select(literal(entity_type), model.id, false(), literal(now, ChangeLogEntry.changed_at.type)).order_by(model.id),
+        )).rowcount
+    return count
+
+def seed_counter(conn: Connection):
+    """Continue the id counter after the entries written before it existed"""
+    highest = conn.scalar(select(func.max(ChangeLogEntry.id)))
+    name, year = COUNTER
+    exists = conn.scalar(select(NumberSequence.last_value).where(NumberSequence.name == name, NumberSequence.year == year))
+    if highest and exists is None:
+        conn.execute(insert(NumberSequence).values(name=name, year=year, last_value=highest))
+
+def compact(db: Session) -> int:
+    """Drop entries superseded by a newer one for the same entity; tombstones are kept"""
+    latest = select(func.max(ChangeLogEntry.id)).group_by(ChangeLogEntry.entity_type, ChangeLogEntry.entity_id)
+    removed = db.execute(delete(ChangeLogEntry).where(ChangeLogEntry.id.not_in(latest))).rowcount
+    db.commit()
+    return removed
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    import migrations
+
+    if sys.argv[1:] != ["compact"]:
+        sys.exit("Usage: python changes.py compact")
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        print(f"Removed {compact(db)} superseded change log entries")
+    finally:
+        db.close()
@@ -1,6 +1,55 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
+import importlib.util
 import os
+import threading
+import time
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+# Pool settings. With several uvicorn workers each process gets its own pool, so keep
+# WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the server's max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Async engine (asyncpg / aiosqlite) for the hot endpoints; falls back to the sync
+# engine in the threadpool when disabled or when the driver is not installed
+DB_ASYNC = _env_bool("DB_ASYNC", "true")
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
 
 # Railway provides DATABASE_URL for PostgreSQL
 # Falls back to SQLite for local development
@@ -10,16 +59,117 @@ if DATABASE_URL:
     # Railway PostgreSQL URL fix (postgres:// -> postgresql://)
     if DATABASE_URL.startswith("postgres://"):
         DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    engine = create_engine(DATABASE_URL)
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
 else:
     # Local development with SQLite
-    engine = create_engine("sqlite:///./kh_legal_erp.db", connect_args={"check_same_thread": False})
+    engine = create_engine(
+        "sqlite:///./kh_legal_erp.db",
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    )
+
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the single writer; NORMAL is durable enough under WAL
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    event.listen(engine, "connect", _sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _create_async_engine():
+    url = engine.url
+    pool_args = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+    if url.get_backend_name() == "postgresql":
+        if not importlib.util.find_spec("asyncpg"):
+            return None
+        connect_args = {}
+        # asyncpg does not understand libpq's sslmode query parameter
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            url = url.difference_update_query(["sslmode"])
+            connect_args["ssl"] = sslmode not in ("disable", "allow", "prefer")
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        return create_async_engine(
+            url.set(drivername="postgresql+asyncpg"), pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING, connect_args=connect_args, **pool_args,
+        )
+    if not importlib.util.find_spec("aiosqlite"):
+        return None
+    sqlite_engine = create_async_engine(
+        url.set(drivername="sqlite+aiosqlite"), poolclass=AsyncAdaptedQueuePool,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}, **pool_args,
+    )
+    event.listen(sqlite_engine.sync_engine, "connect", _sqlite_pragmas)
+    return sqlite_engine
+
+async_engine = _create_async_engine() if DB_ASYNC else None
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if async_engine else None
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def run_db(fn, *args, **kwargs):
+    """Run fn(session, *args) without blocking the event loop.
+
+    Uses the async engine when it is configured (the sync ORM code runs on the async
+    connection through AsyncSession.run_sync), otherwise a sync session in the threadpool.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(fn, *args, **kwargs)
+    def call():
+        with SessionLocal() as session:
+            return fn(session, *args, **kwargs)
+    return await run_in_threadpool(call)
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    stats = {
+        "backend": engine.dialect.name,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout_seconds": DB_POOL_TIMEOUT,
+    }
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update({
+            "checkouts": pool.checkouts,
+            "timeouts": pool.timeouts,
+            "wait_avg_ms": round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0,
+            "wait_max_ms": round(pool.wait_max * 1000, 3),
+        })
+    if async_engine is not None:
+        async_pool = async_engine.pool
+        stats["async"] = {
+            "driver": async_engine.dialect.driver,
+            "size": async_pool.size(),
+            "checked_out": async_pool.checkedout(),
+            "overflow": max(async_pool.overflow(), 0),
+        }
+    return stats
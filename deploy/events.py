@@ -0,0 +1,103 @@
+from typing import AsyncIterator, Optional
+import asyncio
+import os
+import threading
+
+import serializers
+
+# Live updates over server-sent events (GET /api/events).
+#
+# Write endpoints publish to an in-process bus after they commit; every open event stream
+# has its own bounded queue. A client that falls EVENT_QUEUE_SIZE events behind has its
+# queue dropped and gets a single "sync" event instead, telling it to catch up through
+# /api/sync. Idle streams only cost a comment line every EVENT_HEARTBEAT_SECONDS, and
+# publishing with nobody listening returns at once.
+#
+# The bus is per process: with several uvicorn workers a client only sees events from
+# writes handled by its own worker, and picks up the rest on its next sync.
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+EVENT_RETRY_MS = 5000
+
+def format_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + serializers.dumps(data) + b"\n\n"
+
+SYNC_EVENT = format_event("sync", {})
+
+class Subscription:
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, message: bytes):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog, the client resyncs instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(SYNC_EVENT)
+            self.overflowed = True
+
+    async def next(self, timeout: float) -> Optional[bytes]:
+        """Next message, or None when nothing arrived within timeout"""
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message is SYNC_EVENT:
+            self.overflowed = False
+        return message
+
+class EventBus:
+    def __init__(self, queue_size: int, heartbeat: float):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._subscribers = set()
+        self._loop = None
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def listening(self) -> bool:
+        """Whether anyone is subscribed; lets publishers skip building payloads"""
+        return bool(self._subscribers)
+
+    def publish(self, event: str, data):
+        """Send an event to every subscriber; safe to call from any thread"""
+        if not self._subscribers or self._loop is None:
+            return
+        message = format_event(event, data)
+        with self._lock:
+            self.published += 1
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, message)
+        except RuntimeError:  # Event loop already closed at shutdown
+            pass
+
+    def _deliver(self, message: bytes):
+        for subscription in list(self._subscribers):
+            subscription.offer(message)
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """text/event-stream body for one client; unsubscribes when the client goes away"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        try:
+            yield f"retry: {EVENT_RETRY_MS}\n\n".encode()
+            while True:
+                message = await subscription.next(self.heartbeat)
+                yield message if message is not None else b": ping\n\n"
+        finally:
+            self._subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        with self._lock:
+            published = self.published
+        return {"subscribers": len(self._subscribers), "published": published, "queue_size": self.queue_size}
+
+event_bus = EventBus(EVENT_QUEUE_SIZE, EVENT_HEARTBEAT_SECONDS)
@@ -0,0 +1,69 @@
+"""Print the database query plan for each endpoint's hot query.
+
+    python explain_queries.py            # EXPLAIN (EXPLAIN QUERY PLAN on SQLite)
+    python explain_queries.py --analyze  # EXPLAIN ANALYZE, PostgreSQL only
+
+Run it against a production-sized copy of the database after schema or query changes;
+a sequential scan on time_entries or invoices is a regression.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from datetime import date
+import sys
+
+from database import engine
+from models import Matter, MatterStatus, TimeEntry, Document, Invoice
+import main
+import migrations
+import pagination
+import reports
+
+def endpoint_queries(db: Session, today: date):
+    """(name, statement) pairs mirroring the queries issued by the API endpoints"""
+    sample_matter = db.query(func.min(Matter.id)).scalar() or 1
+    sample_invoice = db.query(func.min(Invoice.id)).scalar() or 1
+
+    yield "list_clients", main.clients_page_query(db)
+    yield "list_matters", main.matters_page_query(db, status=MatterStatus.active.value)
+    matter = db.query(Matter.opened_date, Matter.id).order_by(Matter.opened_date.desc(), Matter.id.desc()).first()
+    if matter is not None:
+        cursor = pagination.encode_cursor([matter.opened_date, matter.id])
+        yield "list_matters(cursor)", main.matters_page_query(db, cursor=cursor)
+    page = db.query(Matter.id).filter(Matter.id == sample_matter).subquery()
+    yield "get_matter", main.query_matters_with_totals(db, page)
+    yield "list_time_entries", main.time_entries_page_query(db)
+    yield "list_time_entries(matter)", main.time_entries_page_query(db, matter_id=sample_matter)
+    entry = db.query(TimeEntry.date, TimeEntry.id).order_by(TimeEntry.date.desc(), TimeEntry.id.desc()).first()
+    if entry is not None:
+        cursor = pagination.encode_cursor([entry.date, entry.id])
+        yield "list_time_entries(cursor)", main.time_entries_page_query(db, cursor=cursor)
+    yield "create_invoice(entries)", db.query(TimeEntry).filter(
+        TimeEntry.matter_id == sample_matter, TimeEntry.billable == True, TimeEntry.billed == False)
+    yield "rollup(last_entry_date)", select(func.max(TimeEntry.date)).where(TimeEntry.matter_id == sample_matter)
+    yield "list_documents", db.query(Document).filter(Document.matter_id == sample_matter).order_by(Document.uploaded_at.desc())
+    yield "list_invoices", main.invoices_page_query(db)
+    yield "invoice_pdf(entries)", db.query(TimeEntry).filter(TimeEntry.invoice_id == sample_invoice)
+    yield "dashboard", reports.dashboard_select(db, today)
+    start, end = reports.month_range(today.year, today.month)
+    yield "monthly_report", reports.matter_report_select(start, end)
+
+def explain(db: Session, stmt, analyze: bool = False) -> str:
+    if hasattr(stmt, "statement"):
+        stmt = stmt.statement
+    dialect = db.get_bind().dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        return "\n".join(f"{'  ' * (row[1] > 0)}{row[3]}" for row in rows)
+    prefix = "EXPLAIN (ANALYZE, BUFFERS)" if analyze else "EXPLAIN"
+    return "\n".join(row[0] for row in db.connection().exec_driver_sql(f"{prefix} {sql}"))
+
+if __name__ == "__main__":
+    analyze = "--analyze" in sys.argv
+    migrations.upgrade(engine)
+    with Session(engine) as db:
+        for name, stmt in endpoint_queries(db, date.today()):
+            print(f"── {name} " + "─" * max(0, 70 - len(name)))
+            print(explain(db, stmt, analyze=analyze))
+            print()
+        db.rollback()
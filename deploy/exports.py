@@ -0,0 +1,344 @@
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Iterator, List, Optional
+from xml.sax.saxutils import escape
+import csv
+import io
+import json
+import re
+import zipfile
+
+from database import SessionLocal
+from models import Client, Invoice, Matter, TimeEntry
+from pdf_cache import cached_pdf
+from pdf_service import pdf_service
+import billing
+
+# Streaming exports. Nothing here builds the whole file in memory: output is produced
+# piece by piece from a generator and handed to StreamingResponse as it is ready.
+
+EXPORT_CHUNK_SIZE = 50  # Invoices loaded per short-lived session
+ROW_BATCH_SIZE = 1000  # Rows fetched per server-side cursor round trip and per yielded piece
+
+class _StreamSink(io.RawIOBase):
+    """Write-only, unseekable buffer that zipfile writes into and the generator drains"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INVOICE ARCHIVE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def invoice_ids(db: Session, ids: Optional[List[int]] = None, start: Optional[date] = None, end: Optional[date] = None) -> List[int]:
+    """Existing invoice ids from an explicit list and/or an issue date range"""
+    stmt = select(Invoice.id).order_by(Invoice.issue_date, Invoice.id)
+    if ids is not None:
+        stmt = stmt.where(Invoice.id.in_(ids))
+    if start is not None:
+        stmt = stmt.where(Invoice.issue_date >= start)
+    if end is not None:
+        stmt = stmt.where(Invoice.issue_date <= end)
+    return list(db.scalars(stmt))
+
+def _invoice_jobs(ids: List[int]) -> Iterator[tuple]:
+    for i in range(0, len(ids), EXPORT_CHUNK_SIZE):
+        # Load a chunk and release the connection before handing anything out
+        with SessionLocal() as db:
+            chunk = [(invoice.id, billing.invoice_pdf_fields(invoice)) for invoice in billing.load_invoices(db, ids[i:i + EXPORT_CHUNK_SIZE])]
+        yield from chunk
+
+def _render(invoice_id: int, fields: dict) -> bytes:
+    data, _ = cached_pdf(f"invoice-{invoice_id}", fields, lambda: pdf_service.render("invoice", fields))
+    return data
+
+def invoice_zip_stream(ids: List[int]) -> Iterator[bytes]:
+    """ZIP of invoice PDFs plus a CSV index, yielded one document at a time.
+
+    A few documents render ahead in the PDF pool, so memory stays bounded by that
+    lookahead however many invoices are exported.
+    """
+    sink = _StreamSink()
+    index = io.StringIO()
+    writer = csv.writer(index, delimiter=";")
+    writer.writerow(["laskunumero", "päiväys", "eräpäivä", "asiakas", "toimeksianto", "veroton", "alv", "yhteensä", "tiedosto"])
+    lookahead = max(pdf_service.workers, 1) * 2
+    with ThreadPoolExecutor(max_workers=lookahead) as pool, \
+            zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        pending = deque()
+        jobs = _invoice_jobs(ids)
+
+        def submit_next() -> bool:
+            job = next(jobs, None)
+            if job is None:
+                return False
+            pending.append((job[1], pool.submit(_render, *job)))
+            return True
+
+        while len(pending) < lookahead and submit_next():
+            pass
+        while pending:
+            fields, future = pending.popleft()
+            data = future.result()
+            filename = f"lasku_{fields['invoice_number']}.pdf"
+            info = zipfile.ZipInfo(filename, date_time=fields["issue_date"].timetuple()[:6])
+            archive.writestr(info, data)  # PDFs are already compressed
+            writer.writerow([
+                fields["invoice_number"], fields["issue_date"].isoformat(), fields["due_date"].isoformat(),
+                fields["client_name"], fields["matter_reference"],
+                f"{fields['subtotal']:.2f}", f"{fields['vat_amount']:.2f}", f"{fields['total']:.2f}", filename,
+            ])
+            del data
+            submit_next()
+            yield sink.drain()
+        archive.writestr("laskut.csv", index.getvalue().encode("utf-8-sig"), compress_type=zipfile.ZIP_DEFLATED)
+    yield sink.drain()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ROW EXPORTS (CSV / JSONL / XLSX)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Each dataset is one Core SELECT (plain tuples, no ORM objects) read with yield_per, which is
+# a server-side cursor on PostgreSQL, and encoded batch by batch as it arrives.
+# Columns are (key, heading): JSONL uses the keys, CSV and XLSX the Finnish headings.
+
+TIME_ENTRY_COLUMNS = [
+    ("id", "id"), ("date", "päivä"), ("matter_reference", "toimeksianto"), ("matter_title", "otsikko"),
+    ("client_name", "asiakas"), ("description", "kuvaus"), ("hours", "tunnit"), ("rate", "tuntihinta"),
+    ("amount", "summa"), ("billable", "laskutettava"), ("billed", "laskutettu"), ("invoice_number", "laskunumero"),
+]
+INVOICE_COLUMNS = [
+    ("invoice_number", "laskunumero"), ("issue_date", "päiväys"), ("due_date", "eräpäivä"), ("status", "tila"),
+    ("paid_date", "maksettu"), ("client_name", "asiakas"), ("client_business_id", "y-tunnus"),
+    ("matter_reference", "toimeksianto"), ("subtotal", "veroton"), ("vat_amount", "alv"), ("total", "yhteensä"),
+]
+MATTER_SUMMARY_COLUMNS = [
+    ("matter_reference", "toimeksianto"), ("matter_title", "otsikko"), ("client_name", "asiakas"),
+    ("matter_type", "tyyppi"), ("hours", "tunnit"), ("billable_hours", "laskutettavat tunnit"),
+    ("amount", "laskutettava summa"), ("unbilled_amount", "laskuttamatta"),
+]
+
+def time_entries_select(start: Optional[date] = None, end: Optional[date] = None, client_id: Optional[int] = None,
+                        matter_id: Optional[int] = None, billed: Optional[bool] = None):
+    amount = case((TimeEntry.billable == True, TimeEntry.hours * TimeEntry.rate), else_=0.0)
+    stmt = select(
+        TimeEntry.id, TimeEntry.date, Matter.reference, Matter.title, Client.name, TimeEntry.description,
+        TimeEntry.hours, TimeEntry.rate, amount, TimeEntry.billable, TimeEntry.billed, Invoice.invoice_number,
+    ).join(Matter, Matter.id == TimeEntry.matter_id).join(Client, Client.id == Matter.client_id) \
+        .outerjoin(Invoice, Invoice.id == TimeEntry.invoice_id).order_by(TimeEntry.date, TimeEntry.id)
+    if start is not None:
+        stmt = stmt.where(TimeEntry.date >= start)
+    if end is not None:
+        stmt = stmt.where(TimeEntry.date <= end)
+    if client_id is not None:
+        stmt = stmt.where(Matter.client_id == client_id)
+    if matter_id is not None:
+        stmt = stmt.where(TimeEntry.matter_id == matter_id)
+    if billed is not None:
+        stmt = stmt.where(TimeEntry.billed == billed)
+    return stmt
+
+def invoices_select(start: Optional[date] = None, end: Optional[date] = None, client_id: Optional[int] = None,
+                    matter_id: Optional[int] = None, status: Optional[str] = None):
+    stmt = select(
+        Invoice.invoice_number, Invoice.issue_date, Invoice.due_date, Invoice.status, Invoice.paid_date,
+        Client.name, Client.business_id, Matter.reference, Invoice.subtotal, Invoice.vat_amount, Invoice.total,
+    ).join(Matter, Matter.id == Invoice.matter_id).join(Client, Client.id == Matter.client_id) \
+        .order_by(Invoice.issue_date, Invoice.id)
+    if start is not None:
+        stmt = stmt.where(Invoice.issue_date >= start)
+    if end is not None:
+        stmt = stmt.where(Invoice.issue_date <= end)
+    if client_id is not None:
+        stmt = stmt.where(Matter.client_id == client_id)
+    if matter_id is not None:
+        stmt = stmt.where(Invoice.matter_id == matter_id)
+    if status is not None:
+        stmt = stmt.where(Invoice.status == status)
+    return stmt
+
+def matter_summary_select(start: Optional[date] = None, end: Optional[date] = None, client_id: Optional[int] = None,
+                          matter_id: Optional[int] = None, billed: Optional[bool] = None):
+    """Per-matter totals over the time entries matching the filters"""
+    billable = TimeEntry.billable == True
+    amount = TimeEntry.hours * TimeEntry.rate
+    stmt = select(
+        Matter.reference, Matter.title, Client.name, Matter.matter_type,
+        func.sum(TimeEntry.hours), func.sum(case((billable, TimeEntry.hours), else_=0)),
+        func.sum(case((billable, amount), else_=0)), func.sum(case((billable & (TimeEntry.billed == False), amount), else_=0)),
+    ).join(Matter, Matter.id == TimeEntry.matter_id).join(Client, Client.id == Matter.client_id) \
+        .group_by(Matter.id, Matter.reference, Matter.title, Client.name, Matter.matter_type).order_by(Matter.reference)
+    if start is not None:
+        stmt = stmt.where(TimeEntry.date >= start)
+    if end is not None:
+        stmt = stmt.where(TimeEntry.date <= end)
+    if client_id is not None:
+        stmt = stmt.where(Matter.client_id == client_id)
+    if matter_id is not None:
+        stmt = stmt.where(TimeEntry.matter_id == matter_id)
+    if billed is not None:
+        stmt = stmt.where(TimeEntry.billed == billed)
+    return stmt
+
+# Filters beyond start, end, client_id and matter_id that each dataset understands
+DATASETS = {
+    "time-entries": (TIME_ENTRY_COLUMNS, time_entries_select, ("billed",)),
+    "invoices": (INVOICE_COLUMNS, invoices_select, ("status",)),
+    "matters": (MATTER_SUMMARY_COLUMNS, matter_summary_select, ("billed",)),
+}
+OPTIONAL_FILTERS = ("billed", "status")
+
+def unsupported_filters(dataset: str, filters: dict) -> list:
+    """Names of the given (non-None) filters that do not apply to dataset"""
+    _, _, supported = DATASETS[dataset]
+    return [name for name in OPTIONAL_FILTERS if filters.get(name) is not None and name not in supported]
+
+def _row_batches(stmt) -> Iterator[list]:
+    # One session for the whole stream: the cursor has to stay open until the last row
+    with SessionLocal() as db:
+        result = db.execute(stmt.execution_options(yield_per=ROW_BATCH_SIZE))
+        for batch in result.partitions():
+            yield [tuple(getattr(v, "value", v) for v in row) for row in batch]  # Enums to their values
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    if isinstance(value, date):
+        return value.isoformat()
+    return "" if value is None else value
+
+def csv_stream(columns: list, batches: Iterator[list]) -> Iterator[bytes]:
+    """Semicolon-separated UTF-8 with BOM, which Finnish Excel opens as-is"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow([heading for _, heading in columns])
+    yield buffer.getvalue().encode("utf-8-sig")
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(v) for v in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+def jsonl_stream(columns: list, batches: Iterator[list]) -> Iterator[bytes]:
+    keys = [key for key, _ in columns]
+    for batch in batches:
+        yield "".join(json.dumps(dict(zip(keys, row)), default=str, ensure_ascii=False) + "\n" for row in batch).encode("utf-8")
+
+# Minimal SpreadsheetML package: inline strings instead of a shared string table, so the
+# sheet can be written top to bottom in one pass through the same streaming ZIP sink.
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Vienti" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Cell styles: 0 default, 1 date, 2 bold heading, 3 two decimals
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+XLSX_EPOCH = date(1899, 12, 30)
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _xlsx_cell(value, style: int = 0) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, float):
+        return f'<c s="3"><v>{value!r}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - XLSX_EPOCH).days}</v></c>'
+    text = escape(_XML_INVALID.sub("", str(value)))
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_row(values, style: int = 0) -> str:
+    return "<row>" + "".join(_xlsx_cell(v, style) for v in values) + "</row>"
+
+def xlsx_stream(columns: list, batches: Iterator[list]) -> Iterator[bytes]:
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row([heading for _, heading in columns], style=2).encode("utf-8"))
+            yield sink.drain()
+            for batch in batches:
+                sheet.write("".join(_xlsx_row(row) for row in batch).encode("utf-8"))
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+FORMATS = {
+    "csv": (csv_stream, "text/csv"),
+    "jsonl": (jsonl_stream, "application/x-ndjson"),
+    "xlsx": (xlsx_stream, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+def rows_stream(dataset: str, file_format: str, **filters) -> Iterator[bytes]:
+    """Encoded export of a dataset, produced batch by batch from a server-side cursor"""
+    columns, build_select, supported = DATASETS[dataset]
+    encode, _ = FORMATS[file_format]
+    filters = {name: value for name, value in filters.items() if name not in OPTIONAL_FILTERS or name in supported}
+    return encode(columns, _row_batches(build_select(**filters)))
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 
 // ═══════════════════════════════════════════════════════════════════════════════
 // API CONFIGURATION
@@ -38,6 +38,17 @@ const api = {
   downloadPdf: (endpoint) => window.open(`${API_BASE}/api${endpoint}`, '_blank')
 };
 
+// Apply a /api/sync delta to a list: replace or add changed records, drop deleted ones
+const mergeChanges = (list, changed, deleted, compare) => {
+  const items = new Map(list.map(item => [item.id, item]));
+  changed.forEach(item => items.set(item.id, item));
+  deleted.forEach(id => items.delete(id));
+  const merged = [...items.values()];
+  return compare ? merged.sort(compare) : merged;
+};
+const newestFirst = (key) => (a, b) => (b[key] || '').localeCompare(a[key] || '') || b.id - a.id;
+const oldestFirst = (a, b) => a.id - b.id;
+
 // ═══════════════════════════════════════════════════════════════════════════════
 // MAIN APPLICATION
 // ═══════════════════════════════════════════════════════════════════════════════
@@ -57,6 +68,8 @@ const LawFirmERP = () => {
   const [modal, setModal] = useState(null);
   const [toast, setToast] = useState(null);
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
+  const syncToken = useRef(null);
+  const selectedMatterId = useRef(null);
 
   // Forms
   const [newEntry, setNewEntry] = useState({ matter_id: '', date: new Date().toISOString().split('T')[0], hours: '', description: '', billable: true, rate: 250 });
@@ -85,10 +98,9 @@ const LawFirmERP = () => {
   const loadData = useCallback(async () => {
     setLoading(true);
     try {
-      const [m, c, t, s] = await Promise.all([
-        api.get('/matters'), api.get('/clients'), api.get('/time-entries'), api.get('/reports/dashboard')
-      ]);
-      setMatters(m); setClients(c); setTimeEntries(t); setStats(s);
+      const data = await api.get('/bootstrap');
+      setMatters(data.matters); setClients(data.clients); setTimeEntries(data.time_entries); setStats(data.dashboard);
+      syncToken.current = data.sync_token;
       setIsOnline(true);
     } catch {
       setIsOnline(false);
@@ -98,6 +110,28 @@ const LawFirmERP = () => {
     }
   }, []);
 
+  // Fetch only what changed since the last load or sync (after edits, on reconnect)
+  const syncData = useCallback(async () => {
+    if (syncToken.current === null) return loadData();
+    try {
+      let more = true;
+      while (more) {
+        const d = await api.get(`/sync?since=${syncToken.current}`);
+        setMatters(list => mergeChanges(list, d.matters, d.deleted.matters, newestFirst('opened_date')));
+        setClients(list => mergeChanges(list, d.clients, d.deleted.clients, oldestFirst));
+        setTimeEntries(list => mergeChanges(list, d.time_entries, d.deleted.time_entries, newestFirst('date')));
+        setDocuments(list => mergeChanges(list, d.documents.filter(doc => doc.matter_id === selectedMatterId.current), d.deleted.documents));
+        setSelectedMatter(m => (m && d.matters.find(x => x.id === m.id)) || m);
+        if (d.dashboard) setStats(d.dashboard);
+        more = d.more && d.token !== syncToken.current;
+        syncToken.current = d.token;
+      }
+      setIsOnline(true);
+    } catch {
+      setIsOnline(false);
+    }
+  }, [loadData]);
+
   const loadDemoData = () => {
     const demoClients = [
       { id: 1, name: 'Nordea Bank Oyj', business_id: '0112233-4', email: 'legal@nordea.fi' },
@@ -132,7 +166,43 @@ const LawFirmERP = () => {
   };
 
   useEffect(() => { loadData(); }, [loadData]);
-  useEffect(() => { if (selectedMatter) loadMatterDocs(selectedMatter.id); }, [selectedMatter]);
+  useEffect(() => {
+    window.addEventListener('online', syncData);
+    return () => window.removeEventListener('online', syncData);
+  }, [syncData]);
+  useEffect(() => {
+    selectedMatterId.current = selectedMatter ? selectedMatter.id : null;
+    if (selectedMatter) loadMatterDocs(selectedMatter.id);
+  }, [selectedMatter && selectedMatter.id]);
+
+  // Live updates pushed by the server; "sync" means catch up through /api/sync
+  useEffect(() => {
+    if (!isOnline || typeof EventSource === 'undefined') return;
+    const source = new EventSource(`${API_BASE}/api/events`);
+    let connected = false;
+    source.onopen = () => { if (connected) syncData(); connected = true; };  // Events may have been missed while reconnecting
+    const applyMatter = (matter) => {
+      setMatters(list => mergeChanges(list, [matter], [], newestFirst('opened_date')));
+      setSelectedMatter(m => (m && m.id === matter.id) ? matter : m);
+    };
+    source.addEventListener('time_entry', (e) => {
+      const d = JSON.parse(e.data);
+      setTimeEntries(list => mergeChanges(list, [d.entry], [], newestFirst('date')));
+      applyMatter(d.matter); setStats(d.dashboard);
+    });
+    source.addEventListener('time_entry_deleted', (e) => {
+      const d = JSON.parse(e.data);
+      setTimeEntries(list => mergeChanges(list, [], [d.id]));
+      applyMatter(d.matter); setStats(d.dashboard);
+    });
+    source.addEventListener('invoice', (e) => {
+      const d = JSON.parse(e.data);
+      const billed = new Set(d.time_entry_ids);
+      setTimeEntries(list => list.map(t => billed.has(t.id) ? { ...t, billed: true, invoice_id: d.invoice.id } : t));
+    });
+    source.addEventListener('sync', () => syncData());
+    return () => source.close();
+  }, [isOnline, syncData]);
 
   // Actions
   const handleCreateEntry = async () => {
@@ -145,7 +215,7 @@ const LawFirmERP = () => {
         setTimeEntries([{ id: Date.now(), ...newEntry, matter_id: +newEntry.matter_id, hours: +newEntry.hours, rate: newEntry.billable ? +newEntry.rate : 0, billed: false }, ...timeEntries]);
       }
       setNewEntry({ matter_id: '', date: new Date().toISOString().split('T')[0], hours: '', description: '', billable: true, rate: 250 });
-      setModal(null); showToast('Aikamerkintä tallennettu'); loadData();
+      setModal(null); showToast('Aikamerkintä tallennettu'); syncData();
     } catch { showToast('Virhe', 'error'); }
   };
 
@@ -198,7 +268,7 @@ const LawFirmERP = () => {
     try {
       const inv = await api.post('/invoices', { matter_id: selectedMatter.id, time_entry_ids: unbilled.map(e => e.id) });
       api.downloadPdf(`/invoices/${inv.id}/pdf`);
-      showToast('Lasku luotu'); loadData(); setModal(null);
+      showToast('Lasku luotu'); syncData(); setModal(null);
     } catch { showToast('Virhe', 'error'); }
   };
 
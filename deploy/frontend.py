@@ -0,0 +1,174 @@
+from fastapi import Request
+from fastapi.responses import Response
+from typing import Optional
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+try:
+    import esbuild_py
+except ImportError:  # Optional: falls back to the esbuild binary or to Babel in the browser
+    esbuild_py = None
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+from pdf_cache import not_modified
+
+# Frontend bundle, built once per process instead of on every page load.
+#
+# frontend.jsx is turned into a plain script against the React UMD globals and transpiled on
+# the server (esbuild binary if on PATH, else the esbuild_py wheel). The result is served as
+# /static/app.<hash>.js with immutable caching, and the small HTML shell that references it is
+# kept in memory with an ETag. Both are precompressed with gzip and, when available, brotli.
+# Without a transpiler the page falls back to compiling in the browser with Babel as before.
+
+FRONTEND_PATH = os.path.join(os.path.dirname(__file__), "frontend.jsx")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+REACT_SCRIPTS = """  <script src="https://unpkg.com/react@18/umd/react.production.min.js" crossorigin defer></script>
+  <script src="https://unpkg.com/react-dom@18/umd/react-dom.production.min.js" crossorigin defer></script>"""
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="fi">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
+  <meta name="theme-color" content="#115E59">
+  <meta name="apple-mobile-web-app-capable" content="yes">
+  <meta name="apple-mobile-web-app-status-bar-style" content="black-translucent">
+  <title>KH Legal ERP</title>
+  <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><rect fill='%23115E59' width='100' height='100'/><text y='70' x='15' font-size='60' fill='white' font-family='serif' font-weight='bold'>KH</text></svg>">
+{scripts}
+  <style>body {{ margin: 0; }}</style>
+</head>
+<body>
+  <div id="root"></div>
+{body_scripts}
+</body>
+</html>"""
+
+FALLBACK_APP = """
+const App = () => {
+  const [stats, setStats] = React.useState(null);
+  React.useEffect(() => {
+    fetch('/api/reports/dashboard').then(r => r.json()).then(setStats).catch(() => setStats({}));
+  }, []);
+  return React.createElement('div', {style: {fontFamily: 'system-ui', padding: 40, maxWidth: 800, margin: '0 auto', textAlign: 'center'}},
+    React.createElement('div', {style: {width: 60, height: 60, background: '#115E59', color: 'white', display: 'flex', alignItems: 'center', justifyContent: 'center', margin: '0 auto 20px', fontSize: 20, fontWeight: 'bold'}}, 'KH'),
+    React.createElement('h1', {style: {marginBottom: 10, fontSize: 32}}, 'KH Legal ERP'),
+    React.createElement('p', {style: {color: '#666', marginBottom: 30}}, 'Backend is running! Frontend file not found.'),
+    React.createElement('p', null, React.createElement('a', {href: '/docs', style: {color: '#115E59'}}, 'API Documentation →'))
+  );
+};
+ReactDOM.createRoot(document.getElementById('root')).render(React.createElement(App));
+"""
+
+_IMPORT_REACT = re.compile(r"^import\s*\{([^}]*)\}\s*from\s*['\"]react['\"];?[ \t]*$", re.M)
+_EXPORT_DEFAULT = re.compile(r"^export\s+default\s+(\w+);?[ \t]*$", re.M)
+
+class StaticAsset:
+    """Response body held in memory with its ETag and precompressed variants"""
+
+    def __init__(self, content: bytes, media_type: str, cache_control: str):
+        self.content = content
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:20]}"'
+        self.encoded = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(content, quality=11)
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        """Strong ETags must differ between the identity and each compressed body"""
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def response(self, request: Request) -> Response:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in self.encoded and e in accepted), None)
+        headers = {"ETag": self.variant_etag(encoding), "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(self.content, media_type=self.media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(self.encoded[encoding], media_type=self.media_type, headers=headers)
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        try:
+            q = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BUILD
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def to_script(source: str) -> str:
+    """Rewrite the module-style frontend.jsx to run as a plain script on the React UMD globals"""
+    source = _IMPORT_REACT.sub(r"const {\1} = React;", source)
+    return _EXPORT_DEFAULT.sub(r"ReactDOM.createRoot(document.getElementById('root')).render(React.createElement(\1));", source)
+
+def transpile(source: str) -> tuple:
+    """(JavaScript, transpiler name), or (None, None) if no transpiler is available"""
+    esbuild = shutil.which("esbuild")
+    if esbuild:
+        result = subprocess.run(
+            [esbuild, "--loader=jsx", "--minify", "--target=es2019"],
+            input=source.encode("utf-8"), capture_output=True, check=True, timeout=60,
+        )
+        return result.stdout.decode("utf-8"), "esbuild"
+    if esbuild_py is not None:
+        return esbuild_py.transform(source), "esbuild_py"
+    return None, None
+
+class FrontendBundle:
+    def __init__(self):
+        if os.path.exists(FRONTEND_PATH):
+            with open(FRONTEND_PATH, "r", encoding="utf-8") as f:
+                source = to_script(f.read())
+            code, self.transpiler = transpile(source)
+        else:
+            code, self.transpiler = FALLBACK_APP, "none"
+        self.assets = {}
+        if code is None:
+            # No transpiler installed: ship the JSX and let Babel compile it in the browser
+            scripts = REACT_SCRIPTS.replace(" defer", "") + '\n  <script src="https://unpkg.com/@babel/standalone/babel.min.js"></script>'
+            body_scripts = f'  <script type="text/babel">\n{source}\n  </script>'
+        else:
+            script = StaticAsset(f"(() => {{\n{code}\n}})();\n".encode("utf-8"), "application/javascript", IMMUTABLE)
+            digest = script.etag.strip('"')[:12]
+            name = f"app.{digest}.js"
+            self.assets[name] = script
+            scripts = REACT_SCRIPTS + f'\n  <script src="/static/{name}" defer></script>'
+            body_scripts = ""
+        html = HTML_TEMPLATE.format(scripts=scripts, body_scripts=body_scripts)
+        self.index = StaticAsset(html.encode("utf-8"), "text/html", REVALIDATE)  # Starlette adds the charset
+
+    def asset(self, name: str) -> Optional[StaticAsset]:
+        return self.assets.get(name)
+
+_bundle = None
+_bundle_lock = threading.Lock()
+
+def bundle() -> FrontendBundle:
+    """The process-wide bundle, built on first use (startup calls this to build it eagerly)"""
+    global _bundle
+    if _bundle is None:
+        with _bundle_lock:
+            if _bundle is None:
+                _bundle = FrontendBundle()
+    return _bundle
@@ -0,0 +1,170 @@
+from sqlalchemy import select, insert, or_
+from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from typing import List
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from models import Matter, TimeEntry
+from schemas import TimeEntryImport
+import changes
+import reports
+import rollups
+import search
+
+# Bulk time entry import, for the API (a week from a calendar export) and for the CLI
+# (years of history from the old system).
+#
+# Every row is validated first and all matters are resolved with one IN query. Valid rows
+# are then inserted in one transaction with executemany INSERT ... RETURNING (batched into
+# multi-row VALUES by SQLAlchemy), and the search index, matter totals and sync change log
+# are updated in bulk for the whole import instead of once per entry.
+
+IMPORT_CHUNK_SIZE = 1000  # Rows per INSERT ... RETURNING and search index batch
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "5000"))
+MAX_HOURS = 24
+
+def _validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc']) or 'rivi'}: {err['msg']}" for err in e.errors())
+
+def validate_rows(db: Session, raw_rows: List[dict]) -> tuple:
+    """(insertable rows, per-row errors); rows keep their 1-based input position in "row\""""
+    parsed, errors = [], []
+    for position, raw in enumerate(raw_rows, start=1):
+        try:
+            item = TimeEntryImport.model_validate(raw)
+        except ValidationError as e:
+            errors.append({"row": position, "error": _validation_error(e)})
+            continue
+        if item.matter_id is None and not item.matter_reference:
+            errors.append({"row": position, "error": "matter_id tai matter_reference puuttuu"})
+        elif not 0 < item.hours <= MAX_HOURS:
+            errors.append({"row": position, "error": f"Tuntimäärän on oltava 0–{MAX_HOURS}"})
+        elif not item.description.strip():
+            errors.append({"row": position, "error": "Kuvaus puuttuu"})
+        else:
+            parsed.append((position, item))
+
+    matter_ids = {item.matter_id for _, item in parsed if item.matter_id is not None}
+    references = {item.matter_reference for _, item in parsed if item.matter_id is None}
+    by_id, by_reference = {}, {}
+    if parsed:
+        for matter_id, reference, hourly_rate in db.execute(
+            select(Matter.id, Matter.reference, Matter.hourly_rate)
+            .where(or_(Matter.id.in_(matter_ids), Matter.reference.in_(references)))
+        ):
+            by_id[matter_id] = (matter_id, hourly_rate)
+            by_reference[reference] = (matter_id, hourly_rate)
+
+    rows = []
+    for position, item in parsed:
+        matter = by_id.get(item.matter_id) if item.matter_id is not None else by_reference.get(item.matter_reference)
+        if matter is None:
+            errors.append({"row": position, "error": "Toimeksiantoa ei löydy"})
+            continue
+        matter_id, hourly_rate = matter
+        rate = item.rate if item.rate else hourly_rate  # Same defaulting as a single create
+        rows.append({
+            "row": position, "matter_id": matter_id, "date": item.date, "hours": item.hours,
+            "description": item.description, "billable": item.billable, "rate": rate if item.billable else 0,
+            "billed": item.billed,
+        })
+    errors.sort(key=lambda e: e["row"])
+    return rows, errors
+
+def insert_rows(db: Session, rows: List[dict]) -> List[int]:
+    """Insert validated rows and update the search index and matter totals; caller commits"""
+    conn = db.connection()
+    ids = []
+    for i in range(0, len(rows), IMPORT_CHUNK_SIZE):
+        chunk = rows[i:i + IMPORT_CHUNK_SIZE]
+        values = [{k: v for k, v in row.items() if k != "row"} for row in chunk]
+        created = db.execute(insert(TimeEntry).returning(TimeEntry.id, sort_by_parameter_order=True), values).scalars().all()
+        # ORM bulk inserts skip the flush hook, so index explicitly
+        search.index_rows(conn, [search.time_entry_row(entry_id, row["matter_id"], row["description"]) for entry_id, row in zip(created, chunk)])
+        ids += created
+    rollups.apply_time_entries(db, rows)
+    changes.record(db, "time_entry", ids)
+    changes.record(db, "matter", {row["matter_id"] for row in rows})
+    return ids
+
+def import_rows(db: Session, raw_rows: List[dict], all_or_nothing: bool = True) -> dict:
+    """Validate and insert; with all_or_nothing nothing is inserted if any row is invalid"""
+    started = time.perf_counter()
+    rows, errors = validate_rows(db, raw_rows)
+    ids = []
+    if rows and not (errors and all_or_nothing):
+        ids = insert_rows(db, rows)
+        db.commit()
+        reports.invalidate_dashboard()
+    else:
+        db.rollback()
+    return {
+        "received": len(raw_rows), "inserted": len(ids), "ids": ids, "errors": errors,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FILE READERS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def read_csv(path: str, delimiter: str = None) -> List[dict]:
+    """Rows of a CSV with a header row named like TimeEntryImport's fields.
+
+    The delimiter defaults to ';' when the header has one (Finnish Excel) and ',' otherwise;
+    decimal commas in hours and rate are accepted and empty cells count as missing.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = f.readline()
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=delimiter or (";" if ";" in header else ","))
+        rows = []
+        for raw in reader:
+            row = {key.strip(): value.strip() for key, value in raw.items() if key and value is not None and value.strip()}
+            for key in ("hours", "rate"):
+                if key in row:
+                    row[key] = row[key].replace(",", ".")
+            rows.append(row)
+    return rows
+
+def read_jsonl(path: str) -> List[dict]:
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                sys.exit(f"{path}:{line_number}: invalid JSON: {e}")
+    return rows
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    import migrations
+
+    parser = argparse.ArgumentParser(description="Import time entries from CSV or JSON Lines")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--delimiter", help="CSV delimiter (default: ';' if the header has one, else ',')")
+    parser.add_argument("--partial", action="store_true", help="insert the valid rows even if some rows fail")
+    args = parser.parse_args()
+
+    file_format = args.format or ("jsonl" if args.file.endswith((".jsonl", ".ndjson")) else "csv")
+    raw_rows = read_jsonl(args.file) if file_format == "jsonl" else read_csv(args.file, args.delimiter)
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        report = import_rows(db, raw_rows, all_or_nothing=not args.partial)
+    finally:
+        db.close()
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}")
+    if report["errors"] and not args.partial:
+        print(f"{len(report['errors'])} invalid rows, nothing imported (use --partial to import the rest)")
+        sys.exit(1)
+    print(f"Imported {report['inserted']} of {report['received']} entries in {report['duration_seconds']}s")
@@ -0,0 +1,141 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, select, delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import date
+from typing import List, Optional
+import sys
+
+from models import Client, ClientLedger, Invoice, Matter
+
+# Per-client receivables, kept in client_ledger so a client statement reads one row instead
+# of summing every invoice. Invoice writes add deltas with an upsert in the same transaction.
+# verify()/rebuild() recompute from the invoices table, like rollups.py does for matters.
+
+AMOUNT_COLUMNS = ["invoice_count", "billed_amount", "invoiced_amount", "paid_amount", "outstanding_amount"]
+DRIFT_TOLERANCE = 0.005
+
+def _empty_row(client_id: int) -> dict:
+    return {"client_id": client_id, "invoice_count": 0, "billed_amount": 0, "invoiced_amount": 0,
+            "paid_amount": 0, "outstanding_amount": 0, "last_invoice_date": None}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INCREMENTAL MAINTENANCE (called inside the writing transaction)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _add(db: Session, rows: List[dict]):
+    """Add each row's amounts to the client's ledger row, creating it on first use"""
+    if not rows:
+        return
+    upsert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = upsert(ClientLedger)
+    excluded = stmt.excluded
+    set_ = {column: getattr(ClientLedger, column) + excluded[column] for column in AMOUNT_COLUMNS}
+    set_["last_invoice_date"] = case(
+        ((ClientLedger.last_invoice_date == None) | (ClientLedger.last_invoice_date < excluded.last_invoice_date), excluded.last_invoice_date),
+        else_=ClientLedger.last_invoice_date,
+    )
+    set_["updated_at"] = func.now()
+    db.execute(stmt.on_conflict_do_update(index_elements=[ClientLedger.client_id], set_=set_), [{**_empty_row(r["client_id"]), **r} for r in rows])
+
+def record_invoice(db: Session, client_id: int, subtotal: float, total: float, issue_date: date):
+    record_invoices(db, [{"client_id": client_id, "subtotal": subtotal, "total": total, "issue_date": issue_date}])
+
+def record_invoices(db: Session, invoices: List[dict]):
+    """New invoices (dicts of client_id, subtotal, total, issue_date), grouped per client"""
+    per_client = {}
+    for invoice in invoices:
+        row = per_client.setdefault(invoice["client_id"], _empty_row(invoice["client_id"]))
+        row["invoice_count"] += 1
+        row["billed_amount"] += invoice["subtotal"]
+        row["invoiced_amount"] += invoice["total"]
+        row["outstanding_amount"] += invoice["total"]
+        if row["last_invoice_date"] is None or row["last_invoice_date"] < invoice["issue_date"]:
+            row["last_invoice_date"] = invoice["issue_date"]
+    _add(db, list(per_client.values()))
+
+def record_payment(db: Session, client_id: int, amount: float):
+    """Invoice marked paid (positive amount) or un-paid again (negative amount)"""
+    _add(db, [{"client_id": client_id, "paid_amount": amount, "outstanding_amount": -amount}])
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REBUILD / VERIFY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def ledger_select(client_ids=None):
+    """Grouped SELECT recomputing the ledger from invoices, one row per client"""
+    paid_total = case((Invoice.status == "paid", Invoice.total), else_=0)
+    stmt = select(
+        Matter.client_id.label("client_id"),
+        func.count(Invoice.id).label("invoice_count"),
+        func.coalesce(func.sum(Invoice.subtotal), 0).label("billed_amount"),
+        func.coalesce(func.sum(Invoice.total), 0).label("invoiced_amount"),
+        func.coalesce(func.sum(paid_total), 0).label("paid_amount"),
+        func.coalesce(func.sum(Invoice.total - paid_total), 0).label("outstanding_amount"),
+        func.max(Invoice.issue_date).label("last_invoice_date"),
+    ).join(Matter, Matter.id == Invoice.matter_id).group_by(Matter.client_id)
+    if client_ids is not None:
+        stmt = stmt.where(Matter.client_id.in_(client_ids))
+    return stmt
+
+def compute_ledger(db: Session, client_ids: Optional[List[int]] = None) -> dict:
+    ids_query = db.query(Client.id)
+    if client_ids is not None:
+        ids_query = ids_query.filter(Client.id.in_(client_ids))
+    rows = {client_id: _empty_row(client_id) for (client_id,) in ids_query}
+    for row in db.execute(ledger_select(client_ids)).mappings():
+        if row["client_id"] in rows:
+            rows[row["client_id"]] = dict(row)
+    return rows
+
+def rebuild(db: Session, client_ids: Optional[List[int]] = None) -> int:
+    rows = compute_ledger(db, client_ids)
+    stmt = delete(ClientLedger)
+    if client_ids is not None:
+        stmt = stmt.where(ClientLedger.client_id.in_(client_ids))
+    db.execute(stmt)
+    if rows:
+        db.execute(insert(ClientLedger), list(rows.values()))
+    return len(rows)
+
+def verify(db: Session) -> List[dict]:
+    """Compare stored ledger rows with a recomputation and return every drifting field"""
+    expected = compute_ledger(db)
+    stored = {row.client_id: row for row in db.query(ClientLedger)}
+    drift = []
+    for client_id, row in expected.items():
+        current = stored.get(client_id)
+        for column in AMOUNT_COLUMNS + ["last_invoice_date"]:
+            actual = getattr(current, column) if current else None
+            wanted = row[column]
+            if current is None and not row["invoice_count"]:
+                continue  # Clients without invoices may not have a ledger row yet
+            if isinstance(wanted, (int, float)) and actual is not None:
+                ok = abs(actual - wanted) <= DRIFT_TOLERANCE
+            else:
+                ok = actual == wanted
+            if not ok:
+                drift.append({"client_id": client_id, "column": column, "stored": actual, "expected": wanted})
+    return drift
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    import migrations
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command not in ("rebuild", "verify"):
+        sys.exit("Usage: python ledger.py [rebuild|verify]")
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        drift = verify(db)
+        for d in drift:
+            print(f"client {d['client_id']}: {d['column']} stored={d['stored']} expected={d['expected']}")
+        print(f"{len(drift)} drifting values")
+        if command == "rebuild":
+            count = rebuild(db)
+            db.commit()
+            print(f"Rebuilt ledger for {count} clients")
+        elif drift:
+            sys.exit(1)
+    finally:
+        db.close()
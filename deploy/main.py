@@ -1,36 +1,64 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from typing import List, Optional
+from contextlib import asynccontextmanager
 from datetime import date, datetime, timedelta
 import os
-import uuid
-import shutil
 from io import BytesIO
 
-from database import engine, get_db
-from models import Base, Client, Matter, TimeEntry, Document, Invoice
+from database import engine, get_db, run_db, pool_stats
+from models import Client, ClientLedger, Matter, MatterTotal, TimeEntry, Document, Invoice
 from models import MatterStatus as MatterStatusDB, MatterType as MatterTypeDB, DocumentType as DocumentTypeDB
 from schemas import (
     ClientCreate, ClientUpdate, ClientResponse,
     MatterCreate, MatterUpdate, MatterResponse,
-    TimeEntryCreate, TimeEntryUpdate, TimeEntryResponse,
+    TimeEntryCreate, TimeEntryUpdate, TimeEntryResponse, BulkTimeEntryRequest, BulkTimeEntryReport,
     DocumentResponse,
-    InvoiceCreate, InvoiceResponse, InvoiceStatusUpdate,
-    MonthlyReport, MatterReportItem, ClientStatement
+    InvoiceCreate, InvoiceResponse, InvoiceStatusUpdate, BatchInvoiceRequest, BatchInvoiceReport,
+    MonthlyReport, MatterReportItem, ReportGroupItem, ReportGrouping, ClientStatement,
+    SearchResult, ExportDataset, ExportFormat, InvoiceStatus, Bootstrap, SyncResponse
 )
-from pdf_reports import InvoicePDF, MonthlyReportPDF, ClientStatementPDF
-
-# Create tables
-Base.metadata.create_all(bind=engine)
+import billing
+import changes
+import ledger
+import exports
+import frontend
+import imports
+import rollups
+import reports
+import migrations
+import processing
+import search
+import sequences
+import serializers
+import storage
+from pagination import apply_keyset, next_cursor, NEXT_CURSOR_HEADER
+from pdf_cache import pdf_cache, pdf_response, not_modified
+from pdf_service import pdf_service
+from processing import document_processor
+from events import event_bus
+from serializers import FastJSONResponse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the schema up to date before serving requests
+    migrations.upgrade(engine)
+    frontend.bundle()
+    pdf_service.start()
+    document_processor.start()
+    yield
+    document_processor.shutdown()
+    pdf_service.shutdown()
 
 app = FastAPI(
     title="KH Legal ERP",
     description="Asianajotoimiston toiminnanohjausjärjestelmä",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -40,100 +68,75 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Document storage
-UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+app.add_middleware(storage.UploadSizeLimitMiddleware)
+
+# Compress large JSON and text responses
+app.add_middleware(serializers.CompressionMiddleware, minimum_size=serializers.GZIP_MIN_SIZE, compresslevel=6)
+os.makedirs(storage.UPLOAD_DIR, exist_ok=True)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # FRONTEND SERVING
 # ═══════════════════════════════════════════════════════════════════════════════
 
 @app.get("/", response_class=HTMLResponse)
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """Serve the React frontend"""
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend.jsx')
-    
-    if os.path.exists(frontend_path):
-        with open(frontend_path, 'r', encoding='utf-8') as f:
-            frontend_code = f.read()
-    else:
-        frontend_code = """
-const App = () => {
-  const [stats, setStats] = React.useState(null);
-  React.useEffect(() => {
-    fetch('/api/reports/dashboard').then(r => r.json()).then(setStats).catch(() => setStats({}));
-  }, []);
-  return React.createElement('div', {style: {fontFamily: 'system-ui', padding: 40, maxWidth: 800, margin: '0 auto', textAlign: 'center'}},
-    React.createElement('div', {style: {width: 60, height: 60, background: '#115E59', color: 'white', display: 'flex', alignItems: 'center', justifyContent: 'center', margin: '0 auto 20px', fontSize: 20, fontWeight: 'bold'}}, 'KH'),
-    React.createElement('h1', {style: {marginBottom: 10, fontSize: 32}}, 'KH Legal ERP'),
-    React.createElement('p', {style: {color: '#666', marginBottom: 30}}, 'Backend is running! Frontend file not found.'),
-    React.createElement('p', null, React.createElement('a', {href: '/docs', style: {color: '#115E59'}}, 'API Documentation →'))
-  );
-};
-ReactDOM.createRoot(document.getElementById('root')).render(React.createElement(App));
-"""
-    
-    html = f'''<!DOCTYPE html>
-<html lang="fi">
-<head>
-  <meta charset="UTF-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-  <meta name="theme-color" content="#115E59">
-  <meta name="apple-mobile-web-app-capable" content="yes">
-  <meta name="apple-mobile-web-app-status-bar-style" content="black-translucent">
-  <title>KH Legal ERP</title>
-  <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><rect fill='%23115E59' width='100' height='100'/><text y='70' x='15' font-size='60' fill='white' font-family='serif' font-weight='bold'>KH</text></svg>">
-  <script src="https://unpkg.com/react@18/umd/react.production.min.js" crossorigin></script>
-  <script src="https://unpkg.com/react-dom@18/umd/react-dom.production.min.js" crossorigin></script>
-  <script src="https://unpkg.com/@babel/standalone/babel.min.js"></script>
-  <style>body {{ margin: 0; }}</style>
-</head>
-<body>
-  <div id="root"></div>
-  <script type="text/babel">
-{frontend_code}
-ReactDOM.createRoot(document.getElementById('root')).render(React.createElement(LawFirmERP));
-  </script>
-</body>
-</html>'''
-    return HTMLResponse(content=html)
+    return frontend.bundle().index.response(request)
+
+@app.get("/static/{name}", include_in_schema=False)
+async def frontend_asset(name: str, request: Request):
+    asset = frontend.bundle().asset(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Tiedostoa ei löydy")
+    return asset.response(request)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # UTILITY FUNCTIONS
 # ═══════════════════════════════════════════════════════════════════════════════
 
 def generate_matter_reference(db: Session) -> str:
-    year = datetime.now().year
-    prefix = f"KH-{year}-"
-    last = db.query(Matter).filter(Matter.reference.like(f"{prefix}%")).order_by(Matter.reference.desc()).first()
-    next_num = int(last.reference.split("-")[-1]) + 1 if last else 1
-    return f"{prefix}{str(next_num).zfill(3)}"
+    return sequences.next_number(db, "matter", datetime.now().year)
 
 def generate_invoice_number(db: Session) -> str:
-    year = datetime.now().year
-    prefix = f"INV-{year}-"
-    last = db.query(Invoice).filter(Invoice.invoice_number.like(f"{prefix}%")).order_by(Invoice.invoice_number.desc()).first()
-    next_num = int(last.invoice_number.split("-")[-1]) + 1 if last else 1
-    return f"{prefix}{str(next_num).zfill(4)}"
-
-def calculate_matter_totals(db: Session, matter_id: int):
-    entries = db.query(TimeEntry).filter(TimeEntry.matter_id == matter_id).all()
-    total_hours = sum(e.hours for e in entries)
-    total_billable = sum(e.hours * e.rate for e in entries if e.billable)
-    return total_hours, total_billable
+    return sequences.next_number(db, "invoice", datetime.now().year)
+
+def query_matters_with_totals(db: Session, page):
+    """Load a page of matters (subquery with an `id` column) with clients and rollup totals in one statement"""
+    return db.query(*serializers.MATTER_COLUMNS) \
+        .join(page, Matter.id == page.c.id) \
+        .outerjoin(Client, Client.id == Matter.client_id) \
+        .outerjoin(MatterTotal, MatterTotal.matter_id == Matter.id)
+
+def matter_response(matter: Matter, total_hours, total_billable) -> MatterResponse:
+    response = MatterResponse.model_validate(matter)
+    response.total_hours = total_hours or 0
+    response.total_billable = total_billable or 0
+    return response
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CLIENT ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-@app.get("/api/clients", response_model=List[ClientResponse], tags=["Clients"])
-def list_clients(skip: int = 0, limit: int = 100, search: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(Client)
+def clients_page_query(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, search: Optional[str] = None):
+    query = db.query(*serializers.CLIENT_COLUMNS)
     if search:
         query = query.filter(Client.name.ilike(f"%{search}%"))
-    return query.offset(skip).limit(limit).all()
+    query = apply_keyset(query, [Client.id], cursor, descending=False)
+    return (query if cursor else query.offset(skip)).limit(limit)
+
+def load_clients(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, search: Optional[str] = None) -> List[dict]:
+    rows = clients_page_query(db, skip, limit, cursor, search).all()
+    return [serializers.client_dict(row) for row in rows]
+
+@app.get("/api/clients", response_model=List[ClientResponse], tags=["Clients"])
+async def list_clients(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, search: Optional[str] = None):
+    clients = await run_db(load_clients, skip, limit, cursor, search)
+    cursor_header = next_cursor(clients, limit, lambda c: [c["id"]]) or ""
+    return FastJSONResponse(clients, headers={NEXT_CURSOR_HEADER: cursor_header})
 
 @app.post("/api/clients", response_model=ClientResponse, tags=["Clients"])
 def create_client(client: ClientCreate, db: Session = Depends(get_db)):
@@ -161,49 +164,108 @@ def update_client(client_id: int, client: ClientUpdate, db: Session = Depends(ge
     db.refresh(db_client)
     return db_client
 
+def build_client_statement(db: Session, client_id: int) -> ClientStatement:
+    row = db.query(Client, ClientLedger).outerjoin(ClientLedger, ClientLedger.client_id == Client.id).filter(Client.id == client_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Asiakasta ei löydy")
+    client, balance = row
+    matters = db.query(
+        Matter.id, Matter.reference, Matter.title, Matter.opened_date, MatterTotal.total_hours,
+        MatterTotal.billable_hours, MatterTotal.billable_amount, MatterTotal.unbilled_amount
+    ).outerjoin(MatterTotal, MatterTotal.matter_id == Matter.id).filter(Matter.client_id == client_id).order_by(Matter.opened_date, Matter.id).all()
+    items = [
+        MatterReportItem(
+            matter_id=m.id, reference=m.reference, title=m.title, client_name=client.name,
+            hours=m.total_hours or 0, billable_hours=m.billable_hours or 0, amount=m.billable_amount or 0
+        )
+        for m in matters
+    ]
+    opened = [m.opened_date for m in matters if m.opened_date]
+    return ClientStatement(
+        client=ClientResponse.model_validate(client),
+        period_start=min(opened) if opened else client.created_at.date(), period_end=date.today(),
+        matters=items, total_hours=sum(m.hours for m in items), total_amount=sum(m.amount for m in items),
+        unbilled_amount=sum(m.unbilled_amount or 0 for m in matters),
+        invoice_count=balance.invoice_count if balance else 0,
+        billed_amount=balance.billed_amount if balance else 0,
+        invoiced_amount=balance.invoiced_amount if balance else 0,
+        paid_amount=balance.paid_amount if balance else 0,
+        outstanding_amount=balance.outstanding_amount if balance else 0,
+    )
+
+@app.get("/api/clients/{client_id}/statement", response_model=ClientStatement, tags=["Clients"])
+async def client_statement(client_id: int):
+    return await run_db(build_client_statement, client_id)
+
+@app.get("/api/clients/{client_id}/statement/pdf", tags=["Clients"])
+async def client_statement_pdf(client_id: int, request: Request):
+    statement = await run_db(build_client_statement, client_id)
+    fields = dict(
+        client_name=statement.client.name, client_business_id=statement.client.business_id,
+        period_start=statement.period_start, period_end=statement.period_end,
+        matters=[m.model_dump() for m in statement.matters], total_hours=statement.total_hours,
+        total_amount=statement.total_amount, invoiced_amount=statement.invoiced_amount,
+        outstanding_amount=statement.outstanding_amount,
+    )
+    inputs = {**fields, "generated": date.today()}
+    return await pdf_response(request, f"statement-{client_id}", inputs, lambda: pdf_service.render_async("statement", fields), f"asiakasraportti_{client_id}.pdf")
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # MATTER ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-@app.get("/api/matters", response_model=List[MatterResponse], tags=["Matters"])
-def list_matters(skip: int = 0, limit: int = 100, status: Optional[str] = None, client_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(Matter).options(joinedload(Matter.client))
+def matters_page_query(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None, client_id: Optional[int] = None, cursor: Optional[str] = None):
+    query = db.query(Matter.id)
     if status:
         query = query.filter(Matter.status == status)
     if client_id:
         query = query.filter(Matter.client_id == client_id)
-    matters = query.order_by(Matter.opened_date.desc()).offset(skip).limit(limit).all()
-    result = []
-    for matter in matters:
-        total_hours, total_billable = calculate_matter_totals(db, matter.id)
-        result.append(MatterResponse(**matter.__dict__, total_hours=total_hours, total_billable=total_billable, client=matter.client))
-    return result
+    query = apply_keyset(query, [Matter.opened_date, Matter.id], cursor)
+    page = (query if cursor else query.offset(skip)).limit(limit).subquery()
+    return query_matters_with_totals(db, page).order_by(Matter.opened_date.desc(), Matter.id.desc())
+
+def load_matters(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None, client_id: Optional[int] = None, cursor: Optional[str] = None) -> List[dict]:
+    rows = matters_page_query(db, skip, limit, status, client_id, cursor).all()
+    return [serializers.matter_dict(row) for row in rows]
+
+@app.get("/api/matters", response_model=List[MatterResponse], tags=["Matters"])
+async def list_matters(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, status: Optional[str] = None, client_id: Optional[int] = None):
+    matters = await run_db(load_matters, skip, limit, status, client_id, cursor)
+    cursor_header = next_cursor(matters, limit, lambda m: [m["opened_date"], m["id"]]) or ""
+    return FastJSONResponse(matters, headers={NEXT_CURSOR_HEADER: cursor_header})
 
 @app.post("/api/matters", response_model=MatterResponse, tags=["Matters"])
 def create_matter(matter: MatterCreate, db: Session = Depends(get_db)):
-    client = db.query(Client).filter(Client.id == matter.client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Asiakasta ei löydy")
-    reference = generate_matter_reference(db)
-    db_matter = Matter(
-        reference=reference, title=matter.title, description=matter.description,
-        client_id=matter.client_id, status=MatterStatusDB[matter.status.value],
-        matter_type=MatterTypeDB[matter.matter_type.value],
-        opened_date=matter.opened_date or date.today(),
-        estimated_value=matter.estimated_value, hourly_rate=matter.hourly_rate
-    )
-    db.add(db_matter)
-    db.commit()
-    db.refresh(db_matter)
-    return MatterResponse(**db_matter.__dict__, total_hours=0, total_billable=0)
+    with sequences.serialized(db):
+        client = db.query(Client).filter(Client.id == matter.client_id).first()
+        if not client:
+            raise HTTPException(status_code=404, detail="Asiakasta ei löydy")
+        reference = generate_matter_reference(db)
+        db_matter = Matter(
+            reference=reference, title=matter.title, description=matter.description,
+            client_id=matter.client_id, status=MatterStatusDB[matter.status.value],
+            matter_type=MatterTypeDB[matter.matter_type.value],
+            opened_date=matter.opened_date or date.today(),
+            estimated_value=matter.estimated_value, hourly_rate=matter.hourly_rate
+        )
+        db.add(db_matter)
+        db.flush()
+        rollups.init_matter(db, db_matter.id)
+        db.commit()
+        reports.invalidate_dashboard()
+        db.refresh(db_matter)
+        return matter_response(db_matter, 0, 0)
+
+def load_matter(db: Session, matter_id: int) -> dict:
+    page = db.query(Matter.id).filter(Matter.id == matter_id).subquery()
+    row = query_matters_with_totals(db, page).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Toimeksiantoa ei löydy")
+    return serializers.matter_dict(row)
 
 @app.get("/api/matters/{matter_id}", response_model=MatterResponse, tags=["Matters"])
-def get_matter(matter_id: int, db: Session = Depends(get_db)):
-    matter = db.query(Matter).options(joinedload(Matter.client)).filter(Matter.id == matter_id).first()
-    if not matter:
-        raise HTTPException(status_code=404, detail="Toimeksiantoa ei löydy")
-    total_hours, total_billable = calculate_matter_totals(db, matter.id)
-    return MatterResponse(**matter.__dict__, total_hours=total_hours, total_billable=total_billable, client=matter.client)
+async def get_matter(matter_id: int):
+    return FastJSONResponse(await run_db(load_matter, matter_id))
 
 @app.patch("/api/matters/{matter_id}", response_model=MatterResponse, tags=["Matters"])
 def update_matter(matter_id: int, matter: MatterUpdate, db: Session = Depends(get_db)):
@@ -218,24 +280,31 @@ def update_matter(matter_id: int, matter: MatterUpdate, db: Session = Depends(ge
     for key, value in update_data.items():
         setattr(db_matter, key, value)
     db.commit()
-    db.refresh(db_matter)
-    total_hours, total_billable = calculate_matter_totals(db, db_matter.id)
-    return MatterResponse(**db_matter.__dict__, total_hours=total_hours, total_billable=total_billable)
+    reports.invalidate_dashboard()
+    return load_matter(db, matter_id)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # TIME ENTRY ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-@app.get("/api/time-entries", response_model=List[TimeEntryResponse], tags=["Time Entries"])
-def list_time_entries(skip: int = 0, limit: int = 100, matter_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(TimeEntry)
+def time_entries_page_query(db: Session, skip: int = 0, limit: int = 100, matter_id: Optional[int] = None, cursor: Optional[str] = None):
+    query = db.query(*serializers.TIME_ENTRY_COLUMNS)
     if matter_id:
         query = query.filter(TimeEntry.matter_id == matter_id)
-    entries = query.order_by(TimeEntry.date.desc()).offset(skip).limit(limit).all()
-    return [TimeEntryResponse(**e.__dict__, amount=e.hours * e.rate if e.billable else 0) for e in entries]
+    query = apply_keyset(query, [TimeEntry.date, TimeEntry.id], cursor)
+    return (query if cursor else query.offset(skip)).limit(limit)
 
-@app.post("/api/time-entries", response_model=TimeEntryResponse, tags=["Time Entries"])
-def create_time_entry(entry: TimeEntryCreate, db: Session = Depends(get_db)):
+def load_time_entries(db: Session, skip: int = 0, limit: int = 100, matter_id: Optional[int] = None, cursor: Optional[str] = None) -> List[dict]:
+    rows = time_entries_page_query(db, skip, limit, matter_id, cursor).all()
+    return [serializers.time_entry_dict(row) for row in rows]
+
+@app.get("/api/time-entries", response_model=List[TimeEntryResponse], tags=["Time Entries"])
+async def list_time_entries(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, matter_id: Optional[int] = None):
+    entries = await run_db(load_time_entries, skip, limit, matter_id, cursor)
+    cursor_header = next_cursor(entries, limit, lambda e: [e["date"], e["id"]]) or ""
+    return FastJSONResponse(entries, headers={NEXT_CURSOR_HEADER: cursor_header})
+
+def insert_time_entry(db: Session, entry: TimeEntryCreate) -> dict:
     matter = db.query(Matter).filter(Matter.id == entry.matter_id).first()
     if not matter:
         raise HTTPException(status_code=404, detail="Toimeksiantoa ei löydy")
@@ -245,9 +314,32 @@ def create_time_entry(entry: TimeEntryCreate, db: Session = Depends(get_db)):
         description=entry.description, billable=entry.billable, rate=rate if entry.billable else 0
     )
     db.add(db_entry)
+    db.flush()
+    rollups.apply_time_entry(db, db_entry)
     db.commit()
+    reports.invalidate_dashboard()
     db.refresh(db_entry)
-    return TimeEntryResponse(**db_entry.__dict__, amount=db_entry.hours * db_entry.rate if db_entry.billable else 0)
+    response = serializers.time_entry_dict([getattr(db_entry, field) for field in serializers.TIME_ENTRY_FIELDS])
+    publish_time_entry_event(db, "time_entry", {"entry": response}, db_entry.matter_id)
+    return response
+
+def publish_time_entry_event(db: Session, event: str, data: dict, matter_id: int):
+    """Push a committed time entry change, with the matter's new totals and the dashboard, to live clients"""
+    if event_bus.listening:
+        event_bus.publish(event, {**data, "matter": load_matter(db, matter_id), "dashboard": reports.cached_dashboard_stats(db)})
+
+@app.post("/api/time-entries", response_model=TimeEntryResponse, tags=["Time Entries"])
+async def create_time_entry(entry: TimeEntryCreate):
+    return FastJSONResponse(await run_db(insert_time_entry, entry))
+
+@app.post("/api/time-entries/bulk", response_model=BulkTimeEntryReport, tags=["Time Entries"])
+async def bulk_create_time_entries(request: BulkTimeEntryRequest):
+    if len(request.entries) > imports.BULK_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"Enintään {imports.BULK_MAX_ROWS} merkintää kerralla")
+    report = await run_db(imports.import_rows, request.entries, request.all_or_nothing)
+    if report["inserted"]:
+        event_bus.publish("sync", {})
+    return report
 
 @app.delete("/api/time-entries/{entry_id}", tags=["Time Entries"])
 def delete_time_entry(entry_id: int, db: Session = Depends(get_db)):
@@ -256,8 +348,13 @@ def delete_time_entry(entry_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Merkintää ei löydy")
     if entry.billed:
         raise HTTPException(status_code=400, detail="Laskutettua merkintää ei voi poistaa")
+    matter_id = entry.matter_id
     db.delete(entry)
+    db.flush()
+    rollups.apply_time_entry(db, entry, sign=-1)
     db.commit()
+    reports.invalidate_dashboard()
+    publish_time_entry_event(db, "time_entry_deleted", {"id": entry_id}, matter_id)
     return {"message": "Poistettu"}
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -268,122 +365,295 @@ def delete_time_entry(entry_id: int, db: Session = Depends(get_db)):
 def list_documents(matter_id: int, db: Session = Depends(get_db)):
     return db.query(Document).filter(Document.matter_id == matter_id).order_by(Document.uploaded_at.desc()).all()
 
-@app.post("/api/matters/{matter_id}/documents", response_model=DocumentResponse, tags=["Documents"])
-async def upload_document(matter_id: int, file: UploadFile = File(...), document_type: str = Form("other"), db: Session = Depends(get_db)):
-    matter = db.query(Matter).filter(Matter.id == matter_id).first()
-    if not matter:
-        raise HTTPException(status_code=404, detail="Toimeksiantoa ei löydy")
-    ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{ext}"
-    file_path = os.path.join(UPLOAD_DIR, str(matter_id), unique_filename)
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    db_doc = Document(
-        matter_id=matter_id, filename=unique_filename, original_filename=file.filename,
-        file_path=file_path, file_size=os.path.getsize(file_path),
-        mime_type=file.content_type or "application/octet-stream",
-        document_type=DocumentTypeDB[document_type]
-    )
+def matter_exists(db: Session, matter_id: int) -> bool:
+    return db.query(Matter.id).filter(Matter.id == matter_id).first() is not None
+
+def insert_document(db: Session, temp_path: str, **fields) -> Document:
+    fields["file_path"] = storage.acquire_blob(db, fields["content_hash"], fields["file_size"], temp_path)
+    db_doc = Document(**fields)
     db.add(db_doc)
+    processing.enqueue(db, db_doc)
     db.commit()
     db.refresh(db_doc)
     return db_doc
 
-@app.get("/api/documents/{document_id}/download", tags=["Documents"])
-def download_document(document_id: int, db: Session = Depends(get_db)):
+@app.post("/api/matters/{matter_id}/documents", response_model=DocumentResponse, tags=["Documents"])
+async def upload_document(matter_id: int, file: UploadFile = File(...), document_type: str = Form("other")):
+    if not await run_db(matter_exists, matter_id):
+        raise HTTPException(status_code=404, detail="Toimeksiantoa ei löydy")
+    if document_type not in DocumentTypeDB.__members__:
+        raise HTTPException(status_code=400, detail="Tuntematon asiakirjatyyppi")
+    temp_path, file_size, content_hash = await storage.receive_upload(file)
+    try:
+        db_doc = await run_db(
+            insert_document, temp_path,
+            matter_id=matter_id, filename=f"{content_hash}{os.path.splitext(file.filename)[1]}",
+            original_filename=file.filename, file_size=file_size, content_hash=content_hash,
+            mime_type=file.content_type or "application/octet-stream",
+            document_type=DocumentTypeDB[document_type]
+        )
+    finally:
+        await storage.discard(temp_path)
+    document_processor.notify()
+    return db_doc
+
+def load_document_meta(db: Session, document_id: int) -> Optional[dict]:
+    doc = db.get(Document, document_id)
+    return storage.document_meta(doc) if doc else None
+
+async def cached_document_meta(document_id: int) -> dict:
+    generation = storage.document_cache.generation
+    meta = storage.document_cache.get(document_id)
+    if meta is None:
+        meta = await run_db(load_document_meta, document_id)
+        if meta is None:
+            raise HTTPException(status_code=404, detail="Asiakirjaa ei löydy")
+        storage.document_cache.set(document_id, meta, generation)
+    return meta
+
+@app.api_route("/api/documents/{document_id}/download", methods=["GET", "HEAD"], tags=["Documents"])
+async def download_document(document_id: int, request: Request):
+    meta = await cached_document_meta(document_id)
+    return await storage.file_response(request, document_id, meta)
+
+@app.get("/api/documents/{document_id}/thumbnail", tags=["Documents"])
+async def document_thumbnail(document_id: int, request: Request):
+    meta = await cached_document_meta(document_id)
+    path = storage.thumbnail_path(meta["content_hash"]) if meta["content_hash"] else None
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Esikatselukuvaa ei ole")
+    headers = {"ETag": f'"{meta["content_hash"]}-thumbnail"', "Cache-Control": f"private, max-age={storage.DOCUMENT_MAX_AGE}"}
+    if not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/png", headers=headers)
+
+@app.delete("/api/documents/{document_id}", tags=["Documents"])
+def delete_document(document_id: int, db: Session = Depends(get_db)):
     doc = db.query(Document).filter(Document.id == document_id).first()
-    if not doc or not os.path.exists(doc.file_path):
+    if not doc:
         raise HTTPException(status_code=404, detail="Asiakirjaa ei löydy")
-    return FileResponse(doc.file_path, filename=doc.original_filename, media_type=doc.mime_type)
+    with storage.releasing(db, doc):
+        db.delete(doc)
+        db.commit()
+    return {"message": "Asiakirja poistettu"}
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # INVOICE ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def invoices_page_query(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    query = apply_keyset(db.query(Invoice), [Invoice.issue_date, Invoice.id], cursor)
+    return (query if cursor else query.offset(skip)).limit(limit)
+
 @app.get("/api/invoices", response_model=List[InvoiceResponse], tags=["Invoices"])
-def list_invoices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(Invoice).order_by(Invoice.issue_date.desc()).offset(skip).limit(limit).all()
+def list_invoices(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    invoices = invoices_page_query(db, skip, limit, cursor).all()
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor(invoices, limit, lambda i: [i.issue_date, i.id]) or ""
+    return invoices
 
 @app.post("/api/invoices", response_model=InvoiceResponse, tags=["Invoices"])
 def create_invoice(invoice: InvoiceCreate, db: Session = Depends(get_db)):
-    matter = db.query(Matter).filter(Matter.id == invoice.matter_id).first()
-    if not matter:
-        raise HTTPException(status_code=404, detail="Toimeksiantoa ei löydy")
-    entries = db.query(TimeEntry).filter(
-        TimeEntry.id.in_(invoice.time_entry_ids), TimeEntry.matter_id == invoice.matter_id,
-        TimeEntry.billable == True, TimeEntry.billed == False
-    ).all()
-    if not entries:
-        raise HTTPException(status_code=400, detail="Ei laskutettavia merkintöjä")
-    subtotal = sum(e.hours * e.rate for e in entries)
-    vat_rate = 0.24
-    vat_amount = subtotal * vat_rate
-    total = subtotal + vat_amount
-    db_invoice = Invoice(
-        invoice_number=generate_invoice_number(db), matter_id=invoice.matter_id,
-        issue_date=date.today(), due_date=date.today() + timedelta(days=invoice.due_days or 14),
-        subtotal=subtotal, vat_rate=vat_rate, vat_amount=vat_amount, total=total, notes=invoice.notes
+    with sequences.serialized(db):
+        matter = db.query(Matter).filter(Matter.id == invoice.matter_id).first()
+        if not matter:
+            raise HTTPException(status_code=404, detail="Toimeksiantoa ei löydy")
+        # Lock the entries before taking the invoice number, in the same order as billing.invoice_chunk,
+        # so that a concurrent batch run neither bills them twice nor deadlocks with this request
+        entries = db.query(TimeEntry).filter(
+            TimeEntry.id.in_(invoice.time_entry_ids), TimeEntry.matter_id == invoice.matter_id,
+            TimeEntry.billable == True, TimeEntry.billed == False
+        ).with_for_update().all()
+        if not entries:
+            raise HTTPException(status_code=400, detail="Ei laskutettavia merkintöjä")
+        subtotal = sum(e.hours * e.rate for e in entries)
+        vat_rate = billing.VAT_RATE
+        vat_amount = subtotal * vat_rate
+        total = subtotal + vat_amount
+        db_invoice = Invoice(
+            invoice_number=generate_invoice_number(db), matter_id=invoice.matter_id,
+            issue_date=date.today(), due_date=date.today() + timedelta(days=invoice.due_days or 14),
+            subtotal=subtotal, vat_rate=vat_rate, vat_amount=vat_amount, total=total, notes=invoice.notes
+        )
+        db.add(db_invoice)
+        db.flush()
+        for entry in entries:
+            entry.billed = True
+            entry.invoice_id = db_invoice.id
+        db.flush()
+        rollups.apply_invoice(db, invoice.matter_id, subtotal)
+        ledger.record_invoice(db, matter.client_id, subtotal, total, db_invoice.issue_date)
+        db.commit()
+        db.refresh(db_invoice)
+        if event_bus.listening:
+            invoice_row = [getattr(db_invoice, field) for field in serializers.INVOICE_FIELDS]
+            event_bus.publish("invoice", {"invoice": serializers.invoice_dict(invoice_row), "time_entry_ids": [e.id for e in entries]})
+        return db_invoice
+
+@app.post("/api/invoices/batch", response_model=BatchInvoiceReport, tags=["Invoices"])
+def batch_invoices(batch: BatchInvoiceRequest, db: Session = Depends(get_db)):
+    if batch.start_date > batch.end_date:
+        raise HTTPException(status_code=400, detail="Alkupäivä on loppupäivän jälkeen")
+    report = billing.run(
+        db, batch.start_date, batch.end_date, client_id=batch.client_id,
+        matter_type=batch.matter_type.value if batch.matter_type else None,
+        due_days=batch.due_days, notes=batch.notes, render=batch.render_pdfs,
     )
-    db.add(db_invoice)
-    db.flush()
-    for entry in entries:
-        entry.billed = True
-        entry.invoice_id = db_invoice.id
+    if report["invoice_count"]:
+        event_bus.publish("sync", {})
+    return report
+
+@app.get("/api/invoices/export", tags=["Invoices"])
+def export_invoices(ids: Optional[str] = None, start_date: Optional[date] = None, end_date: Optional[date] = None, db: Session = Depends(get_db)):
+    if not ids and not (start_date and end_date):
+        raise HTTPException(status_code=400, detail="Anna laskujen tunnisteet tai aikaväli")
+    try:
+        id_list = [int(i) for i in ids.split(",") if i.strip()] if ids else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Virheellinen laskun tunniste")
+    invoice_ids = exports.invoice_ids(db, id_list, start_date, end_date)
+    if not invoice_ids:
+        raise HTTPException(status_code=404, detail="Laskuja ei löydy")
+    filename = f"laskut_{start_date}_{end_date}.zip" if start_date else f"laskut_{date.today()}.zip"
+    return StreamingResponse(exports.invoice_zip_stream(invoice_ids), media_type="application/zip", headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@app.patch("/api/invoices/{invoice_id}", response_model=InvoiceResponse, tags=["Invoices"])
+def update_invoice_status(invoice_id: int, update: InvoiceStatusUpdate, db: Session = Depends(get_db)):
+    db_invoice = db.query(Invoice).options(joinedload(Invoice.matter)).filter(Invoice.id == invoice_id).with_for_update(of=Invoice).first()
+    if not db_invoice:
+        raise HTTPException(status_code=404, detail="Laskua ei löydy")
+    was_paid = db_invoice.status == "paid"
+    db_invoice.status = update.status.value
+    if was_paid != (update.status.value == "paid"):
+        ledger.record_payment(db, db_invoice.matter.client_id, db_invoice.total if not was_paid else -db_invoice.total)
+    if update.status.value == "paid":
+        db_invoice.paid_date = update.paid_date or date.today()
+    elif update.paid_date is not None:
+        db_invoice.paid_date = update.paid_date
+    elif was_paid:
+        db_invoice.paid_date = None  # Payment reversed
     db.commit()
     db.refresh(db_invoice)
+    pdf_cache.invalidate(f"invoice-{invoice_id}")
     return db_invoice
 
-@app.get("/api/invoices/{invoice_id}/pdf", tags=["Invoices"])
-def invoice_pdf(invoice_id: int, db: Session = Depends(get_db)):
-    invoice = db.query(Invoice).options(joinedload(Invoice.time_entries), joinedload(Invoice.matter).joinedload(Matter.client)).filter(Invoice.id == invoice_id).first()
-    if not invoice:
+def load_invoice_pdf_fields(db: Session, invoice_id: int) -> dict:
+    invoices = billing.load_invoices(db, [invoice_id])
+    if not invoices:
         raise HTTPException(status_code=404, detail="Laskua ei löydy")
-    line_items = [{"date": e.date, "description": e.description, "hours": e.hours, "rate": e.rate, "amount": e.hours * e.rate} for e in invoice.time_entries]
-    pdf = InvoicePDF().generate(
-        invoice_number=invoice.invoice_number, issue_date=invoice.issue_date, due_date=invoice.due_date,
-        client_name=invoice.matter.client.name, client_address=invoice.matter.client.address,
-        client_business_id=invoice.matter.client.business_id, matter_reference=invoice.matter.reference,
-        matter_title=invoice.matter.title, line_items=line_items, subtotal=invoice.subtotal,
-        vat_rate=invoice.vat_rate, vat_amount=invoice.vat_amount, total=invoice.total, notes=invoice.notes
-    )
-    return StreamingResponse(BytesIO(pdf), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename=lasku_{invoice.invoice_number}.pdf"})
+    return billing.invoice_pdf_fields(invoices[0])
+
+@app.get("/api/invoices/{invoice_id}/pdf", tags=["Invoices"])
+async def invoice_pdf(invoice_id: int, request: Request):
+    fields = await run_db(load_invoice_pdf_fields, invoice_id)
+    return await pdf_response(request, f"invoice-{invoice_id}", fields, lambda: pdf_service.render_async("invoice", fields), f"lasku_{fields['invoice_number']}.pdf")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# STARTUP DATA AND SYNC
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def load_bootstrap(db: Session, limit: int = 100) -> dict:
+    """First pages of matters, clients and time entries plus the dashboard, in one session"""
+    sync_token = changes.current_token(db)  # Read first: changes made while loading are synced again
+    return {
+        "matters": load_matters(db, limit=limit),
+        "clients": load_clients(db, limit=limit),
+        "time_entries": load_time_entries(db, limit=limit),
+        "dashboard": reports.cached_dashboard_stats(db),
+        "sync_token": sync_token,
+    }
+
+@app.get("/api/bootstrap", response_model=Bootstrap, tags=["Startup"])
+async def bootstrap(limit: int = Query(100, ge=1, le=500)):
+    return FastJSONResponse(await run_db(load_bootstrap, limit))
+
+SYNC_LOADERS = {
+    # entity type: (response key, loader of current rows by id)
+    "client": ("clients", lambda db, ids: [serializers.client_dict(r) for r in db.query(*serializers.CLIENT_COLUMNS).filter(Client.id.in_(ids))]),
+    "matter": ("matters", lambda db, ids: [serializers.matter_dict(r) for r in query_matters_with_totals(db, db.query(Matter.id).filter(Matter.id.in_(ids)).subquery())]),
+    "time_entry": ("time_entries", lambda db, ids: [serializers.time_entry_dict(r) for r in db.query(*serializers.TIME_ENTRY_COLUMNS).filter(TimeEntry.id.in_(ids))]),
+    "invoice": ("invoices", lambda db, ids: [serializers.invoice_dict(r) for r in db.query(*serializers.INVOICE_COLUMNS).filter(Invoice.id.in_(ids))]),
+    "document": ("documents", lambda db, ids: [serializers.document_dict(r) for r in db.query(*serializers.DOCUMENT_COLUMNS).filter(Document.id.in_(ids))]),
+}
+
+def load_sync(db: Session, since: int, limit: int) -> dict:
+    """Current state of everything changed after `since`, tombstones for deletes"""
+    page = changes.changes_since(db, since, limit)
+    result = {"token": page["token"], "more": page["more"]}
+    for entity_type, (key, loader) in SYNC_LOADERS.items():
+        ids = page["changed"][entity_type]
+        result[key] = loader(db, ids) if ids else []
+    result["deleted"] = {key: page["deleted"][entity_type] for entity_type, (key, _) in SYNC_LOADERS.items()}
+    touched = any(page["changed"].values()) or any(page["deleted"].values())
+    result["dashboard"] = reports.cached_dashboard_stats(db) if touched else None
+    return result
+
+@app.get("/api/sync", response_model=SyncResponse, tags=["Startup"])
+async def sync(since: int = Query(0, ge=0), limit: int = Query(changes.SYNC_PAGE_SIZE, ge=1, le=changes.SYNC_PAGE_SIZE)):
+    return FastJSONResponse(await run_db(load_sync, since, limit))
+
+@app.get("/api/events", tags=["Live"])
+async def live_events():
+    """Server-sent events: time_entry, time_entry_deleted, invoice, and sync (fetch /api/sync)"""
+    return StreamingResponse(event_bus.stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # REPORTING ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════════════════
 
 @app.get("/api/reports/dashboard", tags=["Reports"])
-def dashboard(db: Session = Depends(get_db)):
-    today = date.today()
-    week_ago = today - timedelta(days=7)
-    month_start = today.replace(day=1)
-    today_hours = sum(e.hours for e in db.query(TimeEntry).filter(TimeEntry.date == today).all())
-    week_hours = sum(e.hours for e in db.query(TimeEntry).filter(TimeEntry.date >= week_ago).all())
-    month_billable = sum(e.hours * e.rate for e in db.query(TimeEntry).filter(TimeEntry.date >= month_start, TimeEntry.billable == True).all())
-    active_matters = db.query(Matter).filter(Matter.status == MatterStatusDB.active).count()
-    return {"today_hours": today_hours, "week_hours": week_hours, "month_billable": month_billable, "active_matters": active_matters}
+async def dashboard():
+    return await run_db(reports.cached_dashboard_stats)
+
+def build_monthly_report(db: Session, year: int, month: int, client_id: Optional[int] = None, group_by: Optional[ReportGrouping] = None) -> MonthlyReport:
+    start, end = reports.month_range(year, month)
+    rows = reports.matter_report_rows(db, start, end, client_id=client_id)
+    matters = [MatterReportItem(**r) for r in rows]
+    groups = [ReportGroupItem(**g) for g in reports.group_rows(rows, group_by.value)] if group_by else None
+    return MonthlyReport(
+        year=year, month=month, client_id=client_id, group_by=group_by, groups=groups, matters=matters,
+        total_hours=sum(m.hours for m in matters), billable_hours=sum(m.billable_hours for m in matters), total_amount=sum(m.amount for m in matters)
+    )
 
 @app.get("/api/reports/monthly", response_model=MonthlyReport, tags=["Reports"])
-def monthly_report(year: int, month: int, db: Session = Depends(get_db)):
-    entries = db.query(TimeEntry).filter(extract('year', TimeEntry.date) == year, extract('month', TimeEntry.date) == month).all()
-    matter_data = {}
-    for e in entries:
-        if e.matter_id not in matter_data:
-            m = db.query(Matter).options(joinedload(Matter.client)).filter(Matter.id == e.matter_id).first()
-            matter_data[e.matter_id] = {"matter": m, "hours": 0, "billable_hours": 0, "amount": 0}
-        matter_data[e.matter_id]["hours"] += e.hours
-        if e.billable:
-            matter_data[e.matter_id]["billable_hours"] += e.hours
-            matter_data[e.matter_id]["amount"] += e.hours * e.rate
-    matters = [MatterReportItem(matter_id=mid, reference=d["matter"].reference, title=d["matter"].title, client_name=d["matter"].client.name, hours=d["hours"], billable_hours=d["billable_hours"], amount=d["amount"]) for mid, d in matter_data.items()]
-    return MonthlyReport(year=year, month=month, total_hours=sum(d["hours"] for d in matter_data.values()), billable_hours=sum(d["billable_hours"] for d in matter_data.values()), total_amount=sum(d["amount"] for d in matter_data.values()), matters=matters)
+async def monthly_report(year: int, month: int = Query(..., ge=1, le=12), client_id: Optional[int] = None, group_by: Optional[ReportGrouping] = None):
+    return await run_db(build_monthly_report, year, month, client_id, group_by)
 
 @app.get("/api/reports/monthly/pdf", tags=["Reports"])
-def monthly_report_pdf(year: int, month: int, db: Session = Depends(get_db)):
-    report = monthly_report(year=year, month=month, db=db)
-    pdf = MonthlyReportPDF().generate(year=year, month=month, matters=[m.model_dump() for m in report.matters], total_hours=report.total_hours, billable_hours=report.billable_hours, total_amount=report.total_amount)
-    return StreamingResponse(BytesIO(pdf), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename=raportti_{year}_{month:02d}.pdf"})
+async def monthly_report_pdf(request: Request, year: int, month: int = Query(..., ge=1, le=12), client_id: Optional[int] = None):
+    report = await run_db(build_monthly_report, year, month, client_id)
+    fields = dict(year=year, month=month, matters=[m.model_dump() for m in report.matters], total_hours=report.total_hours, billable_hours=report.billable_hours, total_amount=report.total_amount)
+    # The PDF footer carries the generation date, so it is part of the key as well
+    inputs = {**fields, "client_id": client_id, "generated": date.today()}
+    return await pdf_response(request, f"monthly-{year}-{month:02d}", inputs, lambda: pdf_service.render_async("monthly", fields), f"raportti_{year}_{month:02d}.pdf")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DATA EXPORTS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@app.get("/api/exports/{dataset}", tags=["Exports"])
+def export_rows(dataset: ExportDataset, format: ExportFormat = ExportFormat.csv,
+                start_date: Optional[date] = None, end_date: Optional[date] = None, client_id: Optional[int] = None,
+                matter_id: Optional[int] = None, billed: Optional[bool] = None, status: Optional[InvoiceStatus] = None):
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="Alkupäivä on loppupäivän jälkeen")
+    filters = {"billed": billed, "status": status.value if status else None}
+    unsupported = exports.unsupported_filters(dataset.value, filters)
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Aineistoa {dataset.value} ei voi rajata ehdoilla: {', '.join(unsupported)}")
+    stream = exports.rows_stream(
+        dataset.value, format.value, start=start_date, end=end_date, client_id=client_id, matter_id=matter_id, **filters,
+    )
+    filename = f"{dataset.value}_{start_date or 'alku'}_{end_date or 'loppu'}.{format.value}"
+    return StreamingResponse(stream, media_type=exports.FORMATS[format.value][1], headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SEARCH
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@app.get("/api/search", response_model=List[SearchResult], tags=["Search"])
+async def search_all(q: str = Query(..., min_length=2), types: Optional[str] = None, limit: int = Query(20, ge=1, le=100)):
+    entity_types = [t for t in types.split(",") if t in search.ENTITY_TYPES] if types else None
+    return await run_db(search.search, q, entity_types, limit)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # HEALTH CHECK
@@ -393,6 +663,22 @@ def monthly_report_pdf(year: int, month: int, db: Session = Depends(get_db)):
 def health():
     return {"status": "ok", "service": "KH Legal ERP"}
 
+@app.get("/api/system/pool", tags=["System"])
+def database_pool():
+    return pool_stats()
+
+@app.get("/api/system/pdf", tags=["System"])
+def pdf_workers():
+    return pdf_service.stats()
+
+@app.get("/api/system/documents", tags=["System"])
+def document_workers(db: Session = Depends(get_db)):
+    return document_processor.stats(db)
+
+@app.get("/api/system/events", tags=["System"])
+def live_event_stats():
+    return event_bus.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
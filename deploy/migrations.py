@@ -0,0 +1,174 @@
+from sqlalchemy import Column, Integer, String, DateTime, MetaData, Table, inspect, select, text, insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from contextlib import contextmanager
+import sys
+
+from models import Base
+import changes
+import ledger
+import rollups
+import search
+import sequences
+
+# Versioned schema migrations. Each step runs once, in its own transaction, and is
+# recorded in schema_migrations. Steps must be idempotent against databases that were
+# created by the old create_all() at import, so they check before creating.
+
+version_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+MIGRATIONS = []
+ADVISORY_LOCK_ID = 4_815_162_342  # Serialises concurrent uvicorn workers on PostgreSQL
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# HELPERS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def create_tables(conn: Connection, *names: str):
+    for name in names:
+        Base.metadata.tables[name].create(conn, checkfirst=True)
+
+def create_indexes(conn: Connection, table_name: str):
+    existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    for index in Base.metadata.tables[table_name].indexes:
+        if all(c.name in existing for c in index.columns):  # Otherwise created by the migration adding the column
+            index.create(conn, checkfirst=True)
+
+def add_column(conn: Connection, table_name: str, column_name: str):
+    """ALTER TABLE ADD COLUMN using the column definition from models.py"""
+    if column_name in {c["name"] for c in inspect(conn).get_columns(table_name)}:
+        return
+    column = Base.metadata.tables[table_name].c[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}'))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MIGRATIONS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@migration(1, "initial schema")
+def _initial_schema(conn: Connection):
+    create_tables(conn, "clients", "matters", "invoices", "time_entries", "documents", "users")
+
+@migration(2, "matter totals rollup")
+def _matter_totals(conn: Connection):
+    create_tables(conn, "matter_totals")
+    rollups.ensure_populated(Session(bind=conn, join_transaction_mode="create_savepoint"))
+
+@migration(3, "indexes for endpoint predicates")
+def _endpoint_indexes(conn: Connection):
+    for table_name in ("matters", "time_entries", "documents", "invoices"):
+        create_indexes(conn, table_name)
+
+@migration(4, "full-text search index")
+def _search_index(conn: Connection):
+    create_tables(conn, "search_documents")
+    search.create_index(conn)
+    # Populated by migration 8, once documents has every column the models load
+
+@migration(5, "matter reference and invoice number sequences")
+def _number_sequences(conn: Connection):
+    create_tables(conn, "number_sequences")
+    sequences.seed_from_existing(conn)
+
+@migration(6, "client receivables ledger")
+def _client_ledger(conn: Connection):
+    create_tables(conn, "client_ledger")
+    session = Session(bind=conn, join_transaction_mode="create_savepoint")
+    ledger.rebuild(session)
+    session.commit()
+
+@migration(7, "content-addressed document storage")
+def _stored_blobs(conn: Connection):
+    create_tables(conn, "stored_blobs")
+    add_column(conn, "documents", "content_hash")
+    create_indexes(conn, "documents")
+
+@migration(8, "document processing queue")
+def _document_jobs(conn: Connection):
+    for column_name in ("processing_status", "page_count", "has_thumbnail", "text_content"):
+        add_column(conn, "documents", column_name)
+    create_tables(conn, "document_jobs")
+    create_indexes(conn, "document_jobs")
+    search.reindex_all(conn)
+
+@migration(9, "change log for incremental sync")
+def _change_log(conn: Connection):
+    create_tables(conn, "change_log")
+    create_indexes(conn, "change_log")
+    changes.log_existing(conn)
+
+@migration(10, "commit-ordered change log ids")
+def _change_log_counter(conn: Connection):
+    changes.seed_counter(conn)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RUNNER
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+            conn.commit()
+
+def applied_versions(conn: Connection) -> set:
+    version_metadata.create_all(conn, checkfirst=True)
+    return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+def current_version(engine: Engine) -> int:
+    with engine.begin() as conn:
+        return max(applied_versions(conn), default=0)
+
+def upgrade(engine: Engine) -> list:
+    """Apply all pending migrations in order; returns the versions applied"""
+    applied = []
+    with _migration_lock(engine):
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in done:
+                continue
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(insert(schema_migrations).values(version=version, description=description))
+            applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    from database import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        applied = upgrade(engine)
+        print(f"Applied {len(applied)} migrations, schema at version {current_version(engine)}")
+    elif command == "current":
+        print(current_version(engine))
+    elif command == "history":
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+            print(f"{version:>4}  {'applied' if version in done else 'pending':<8} {description}")
+    else:
+        sys.exit("Usage: python migrations.py [upgrade|current|history]")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Date, ForeignKey, Text, Enum, LargeBinary
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Date, ForeignKey, Text, Enum, LargeBinary, Index, text
+from sqlalchemy.orm import relationship, declarative_base, deferred
 from sqlalchemy.sql import func
 import enum
 
@@ -43,9 +43,15 @@ class Client(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     matters = relationship("Matter", back_populates="client")
+    ledger = relationship("ClientLedger", back_populates="client", uselist=False, cascade="all, delete-orphan")
 
 class Matter(Base):
     __tablename__ = "matters"
+    __table_args__ = (
+        Index("ix_matters_opened_date", "opened_date", "id"),
+        Index("ix_matters_status_opened_date", "status", "opened_date"),
+        Index("ix_matters_client_opened_date", "client_id", "opened_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     reference = Column(String(50), unique=True, nullable=False, index=True)
@@ -65,9 +71,36 @@ class Matter(Base):
     time_entries = relationship("TimeEntry", back_populates="matter", cascade="all, delete-orphan")
     documents = relationship("Document", back_populates="matter", cascade="all, delete-orphan")
     invoices = relationship("Invoice", back_populates="matter", cascade="all, delete-orphan")
+    totals = relationship("MatterTotal", back_populates="matter", uselist=False, cascade="all, delete-orphan")
+
+class MatterTotal(Base):
+    """Per-matter rollup of time entries, maintained incrementally by rollups.py"""
+    __tablename__ = "matter_totals"
+    
+    matter_id = Column(Integer, ForeignKey("matters.id"), primary_key=True)
+    total_hours = Column(Float, nullable=False, default=0)
+    billable_hours = Column(Float, nullable=False, default=0)
+    billable_amount = Column(Float, nullable=False, default=0)
+    unbilled_amount = Column(Float, nullable=False, default=0)
+    last_entry_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    matter = relationship("Matter", back_populates="totals")
 
 class TimeEntry(Base):
     __tablename__ = "time_entries"
+    __table_args__ = (
+        Index("ix_time_entries_date", "date", "id"),
+        Index("ix_time_entries_matter_date", "matter_id", "date"),
+        Index("ix_time_entries_billable_billed", "billable", "billed"),
+        Index("ix_time_entries_invoice_id", "invoice_id"),
+        # Candidates for invoicing; partial where the backend supports it
+        Index(
+            "ix_time_entries_unbilled", "matter_id", "date",
+            postgresql_where=text("billable = true AND billed = false"),
+            sqlite_where=text("billable = 1 AND billed = 0"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     matter_id = Column(Integer, ForeignKey("matters.id"), nullable=False)
@@ -86,6 +119,10 @@ class TimeEntry(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_matter_uploaded_at", "matter_id", "uploaded_at"),
+        Index("ix_documents_content_hash", "content_hash"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     matter_id = Column(Integer, ForeignKey("matters.id"), nullable=False)
@@ -94,14 +131,43 @@ class Document(Base):
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String(100), nullable=False)
+    content_hash = Column(String(64), nullable=True)  # SHA-256; NULL for files stored before deduplication
     document_type = Column(Enum(DocumentType), default=DocumentType.other)
     description = Column(Text, nullable=True)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Filled in by the background processing queue (processing.py)
+    processing_status = Column(String(20), nullable=True)  # pending, done, failed, unsupported; NULL = never queued
+    page_count = Column(Integer, nullable=True)
+    has_thumbnail = Column(Boolean, default=False)
+    text_content = deferred(Column(Text, nullable=True))
     
     matter = relationship("Matter", back_populates="documents")
+    jobs = relationship("DocumentJob", back_populates="document", cascade="all, delete-orphan")
+
+class DocumentJob(Base):
+    """Queued background work on a document; rows outlive restarts, see processing.py"""
+    __tablename__ = "document_jobs"
+    __table_args__ = (
+        Index("ix_document_jobs_status_id", "status", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done, failed, skipped
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    document = relationship("Document", back_populates="jobs")
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        Index("ix_invoices_issue_date", "issue_date", "id"),
+        Index("ix_invoices_matter_id", "matter_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     invoice_number = Column(String(50), unique=True, nullable=False)
@@ -120,6 +186,70 @@ class Invoice(Base):
     matter = relationship("Matter", back_populates="invoices")
     time_entries = relationship("TimeEntry", back_populates="invoice")
 
+class NumberSequence(Base):
+    """Per-year counters for matter references and invoice numbers (sequences.py), and change log ids (changes.py)"""
+    __tablename__ = "number_sequences"
+    
+    name = Column(String(20), primary_key=True)  # matter, invoice; change_log (year 0) for change log ids
+    year = Column(Integer, primary_key=True)
+    last_value = Column(Integer, nullable=False)
+
+class StoredBlob(Base):
+    """Content-addressed upload file shared by every document with the same bytes, see storage.py"""
+    __tablename__ = "stored_blobs"
+    
+    content_hash = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ClientLedger(Base):
+    """Per-client receivables balance, maintained on invoice writes by ledger.py"""
+    __tablename__ = "client_ledger"
+    
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    invoice_count = Column(Integer, nullable=False, default=0)
+    billed_amount = Column(Float, nullable=False, default=0)  # Invoiced fees excluding VAT
+    invoiced_amount = Column(Float, nullable=False, default=0)  # Invoice totals including VAT
+    paid_amount = Column(Float, nullable=False, default=0)
+    outstanding_amount = Column(Float, nullable=False, default=0)
+    last_invoice_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    client = relationship("Client", back_populates="ledger")
+
+class SearchDocument(Base):
+    """Searchable text of clients, matters, time entries and documents, maintained by search.py.
+
+    The full-text index itself is backend specific and created by migrations.py: a
+    generated tsvector column with a GIN index on PostgreSQL, an FTS5 table on SQLite.
+    """
+    __tablename__ = "search_documents"
+    __table_args__ = (
+        Index("ux_search_documents_entity", "entity_type", "entity_id", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(20), nullable=False)  # client, matter, time_entry, document
+    entity_id = Column(Integer, nullable=False)
+    matter_id = Column(Integer, nullable=True)
+    title = Column(String(500), nullable=False)
+    body = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ChangeLogEntry(Base):
+    """A create, update or delete of a synced record, the feed behind /api/sync, see changes.py"""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_entity", "entity_type", "entity_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)  # Doubles as the sync token, only ever grows
+    entity_type = Column(String(20), nullable=False)  # client, matter, time_entry, invoice, document
+    entity_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -0,0 +1,57 @@
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from datetime import date, datetime
+from typing import Callable, List, Optional, Sequence
+import base64
+import json
+
+# Opaque keyset cursors. A cursor holds the sort key of the last row on a page; the next
+# page continues strictly after it, so deep pages cost the same as the first one.
+# Every keyset ordering ends in the primary key to make the key unique.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return value
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Virheellinen sivutuskursori")
+
+def apply_keyset(query, columns: Sequence, cursor: Optional[str], descending: bool = True):
+    """Order `query` by `columns` and, given a cursor, continue after the row it points at"""
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+    return query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+
+def next_cursor(items: List, limit: int, key: Callable) -> Optional[str]:
+    """Cursor for the page after `items`, or None when this was the last page"""
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(key(items[-1]))
@@ -0,0 +1,134 @@
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from datetime import date, datetime
+from typing import Optional
+import glob
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from pdf_reports import TEMPLATE_VERSION
+
+# Content-addressed on-disk cache for rendered PDFs.
+#
+# Files are named "<tag>-<key>.pdf": the key is a SHA-256 of every input that affects the
+# rendered bytes plus TEMPLATE_VERSION, so changed inputs simply produce a new key. The tag
+# (e.g. "invoice-42") groups all versions of one document for explicit invalidation. The
+# directory is kept under PDF_CACHE_MAX_MB by evicting the least recently read files.
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdf_cache")
+PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "256"))
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return str(value)
+
+def cache_key(inputs: dict) -> str:
+    payload = json.dumps({"template": TEMPLATE_VERSION, "inputs": inputs}, sort_keys=True, default=_json_default)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class PdfCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Bytes on disk, computed lazily
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, tag: str, key: str) -> str:
+        return os.path.join(self.directory, f"{tag}-{key}.pdf")
+
+    def get(self, tag: str, key: str) -> Optional[bytes]:
+        path = self._path(tag, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, tag: str, key: str, data: bytes):
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+        path = self._path(tag, key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+        self._evict()
+
+    def invalidate(self, tag: str) -> int:
+        removed = 0
+        for path in glob.glob(os.path.join(glob.escape(self.directory), f"{glob.escape(tag)}-*.pdf")):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = None
+        return removed
+
+    def _evict(self):
+        with self._lock:
+            if self._size is not None and self._size <= self.max_bytes:
+                return
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pdf"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            size = sum(e[1] for e in entries)
+            for _, file_size, path in sorted(entries):
+                if size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+            self._size = size
+
+pdf_cache = PdfCache(PDF_CACHE_DIR, int(PDF_CACHE_MAX_MB * 1024 * 1024))
+
+def cached_pdf(tag: str, inputs: dict, render) -> tuple:
+    """(pdf bytes, etag) for `inputs`, calling render() only on a cache miss"""
+    key = cache_key(inputs)
+    data = pdf_cache.get(tag, key)
+    if data is None:
+        data = render()
+        pdf_cache.put(tag, key, data)
+    return data, f'"{key}"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+
+async def pdf_response(request: Request, tag: str, inputs: dict, render, filename: str) -> Response:
+    """PDF download with ETag revalidation; render is awaited only on a cache miss"""
+    etag = f'"{cache_key(inputs)}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    key = etag.strip('"')
+    data = await run_in_threadpool(pdf_cache.get, tag, key)
+    if data is None:
+        data = await render()
+        await run_in_threadpool(pdf_cache.put, tag, key, data)
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return Response(content=data, media_type="application/pdf", headers=headers)
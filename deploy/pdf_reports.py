@@ -6,40 +6,55 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.enums import TA_RIGHT, TA_CENTER, TA_LEFT
 from io import BytesIO
 from datetime import date
+from functools import lru_cache
 from typing import List, Optional
 
+# Bump when the layout of any document changes so cached PDFs are re-rendered
+TEMPLATE_VERSION = "1"
+
+@lru_cache(maxsize=None)
+def base_styles():
+    """Sample stylesheet shared by all reports; styles are read-only once built"""
+    return getSampleStyleSheet()
+
+@lru_cache(maxsize=None)
+def invoice_styles():
+    styles = getSampleStyleSheet()
+    InvoicePDF._setup_styles(styles)
+    return styles
+
 class InvoicePDF:
     """Generate professional invoice PDFs"""
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_styles()
+        self.styles = invoice_styles()
     
-    def _setup_styles(self):
-        self.styles.add(ParagraphStyle(
+    @staticmethod
+    def _setup_styles(styles):
+        styles.add(ParagraphStyle(
             name='CompanyName',
             fontSize=18,
             fontName='Helvetica-Bold',
             spaceAfter=2*mm
         ))
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='InvoiceTitle',
             fontSize=24,
             fontName='Helvetica-Bold',
             alignment=TA_RIGHT
         ))
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='ClientName',
             fontSize=12,
             fontName='Helvetica-Bold',
             spaceAfter=2*mm
         ))
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='TableHeader',
             fontSize=10,
             fontName='Helvetica-Bold'
         ))
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='Total',
             fontSize=12,
             fontName='Helvetica-Bold',
@@ -200,7 +215,7 @@ class MonthlyReportPDF:
     """Generate monthly billing report PDFs"""
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
+        self.styles = base_styles()
     
     def generate(
         self,
@@ -299,7 +314,7 @@ class ClientStatementPDF:
     """Generate client statement PDFs"""
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
+        self.styles = base_styles()
     
     def generate(
         self,
@@ -0,0 +1,182 @@
+from fastapi import HTTPException
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+
+from pdf_reports import InvoicePDF, MonthlyReportPDF, ClientStatementPDF, base_styles, invoice_styles
+
+# PDF rendering off the request path.
+#
+# ReportLab is pure Python and CPU-bound, so rendering inline holds the GIL and stalls every
+# other request in the worker. Jobs go to a small process pool instead; each child builds the
+# stylesheets once in its initializer and reuses them for every document it renders.
+# PDF_WORKERS=0 renders inline in the calling thread (local development, tiny instances).
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_JOB_TIMEOUT = float(os.getenv("PDF_JOB_TIMEOUT", "60"))
+PDF_QUEUE_MAX = int(os.getenv("PDF_QUEUE_MAX", str(max(PDF_WORKERS, 1) * 16)))
+
+RENDERERS = {
+    "invoice": InvoicePDF,
+    "monthly": MonthlyReportPDF,
+    "statement": ClientStatementPDF,
+}
+
+def _warm():
+    """Pool initializer: build the shared stylesheets before the first job arrives"""
+    base_styles()
+    invoice_styles()
+
+def _render(kind: str, fields: dict) -> tuple:
+    start = time.perf_counter()
+    pdf = RENDERERS[kind]().generate(**fields)
+    return pdf, time.perf_counter() - start
+
+class PdfService:
+    def __init__(self, workers: int, timeout: float, queue_max: int):
+        self.workers = workers
+        self.timeout = timeout
+        self.queue_max = queue_max
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.render_total = 0.0
+        self.render_max = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                # spawn, not fork: the parent holds DB pools and threads that must not be copied
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_warm,
+                )
+                # Children start on demand; pay the interpreter + ReportLab import cost at boot instead
+                for _ in range(self.workers):
+                    self._executor.submit(_warm)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _record(self, seconds: float):
+        with self._lock:
+            self.completed += 1
+            self.render_total += seconds
+            self.render_max = max(self.render_max, seconds)
+
+    def _job_done(self, future):
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+
+    def _submit(self, kind: str, fields: dict):
+        """Queue a job on the pool and return (executor, future); None means render inline"""
+        if kind not in RENDERERS:
+            raise ValueError(kind)
+        if self.workers <= 0:
+            return None
+        self.start()
+        with self._lock:
+            executor = self._executor
+            if self.pending >= self.queue_max:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="PDF-palvelu on ruuhkautunut, yritä hetken päästä uudelleen")
+            self.pending += 1
+        try:
+            future = executor.submit(_render, kind, fields)
+        except BrokenProcessPool:
+            with self._lock:
+                self.pending -= 1
+            self._restart(executor)
+            return None
+        future.add_done_callback(self._job_done)
+        return executor, future
+
+    def _restart(self, broken, terminate: bool = False):
+        """Replace the pool `broken` so later jobs keep working; a no-op if it was already replaced"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        # Taken before shutdown(), which forgets them; ProcessPoolExecutor has no public handle (3.11)
+        processes = list((broken._processes or {}).values()) if terminate else []
+        broken.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        self.start()
+
+    def _timed_out(self, executor, future):
+        # cancel() only stops queued jobs. A job that is already running keeps its worker busy
+        # until it finishes, so kill the pool's children and start fresh ones; other jobs that
+        # were running on the old pool fail with BrokenProcessPool and are rendered inline.
+        if not future.cancel() and not future.done():
+            self._restart(executor, terminate=True)
+        with self._lock:
+            self.timeouts += 1
+        raise HTTPException(status_code=504, detail="PDF-generointi aikakatkaistiin")
+
+    def _inline(self, kind: str, fields: dict) -> bytes:
+        pdf, seconds = _render(kind, fields)
+        self._record(seconds)
+        return pdf
+
+    def render(self, kind: str, fields: dict) -> bytes:
+        """Render a document, blocking the calling thread until it is done"""
+        job = self._submit(kind, fields)
+        if job is None:
+            return self._inline(kind, fields)
+        executor, future = job
+        try:
+            pdf, seconds = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._timed_out(executor, future)
+        except BrokenProcessPool:
+            self._restart(executor)
+            return self._inline(kind, fields)
+        self._record(seconds)
+        return pdf
+
+    async def render_async(self, kind: str, fields: dict) -> bytes:
+        """Render a document without blocking the event loop"""
+        job = self._submit(kind, fields)
+        if job is None:
+            return await asyncio.to_thread(self._inline, kind, fields)
+        executor, future = job
+        try:
+            pdf, seconds = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._timed_out(executor, future)
+        except BrokenProcessPool:
+            self._restart(executor)
+            return await asyncio.to_thread(self._inline, kind, fields)
+        self._record(seconds)
+        return pdf
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._executor is not None,
+                "queue_depth": self.pending,
+                "queue_max": self.queue_max,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "render_avg_ms": round(self.render_total / self.completed * 1000, 1) if self.completed else 0,
+                "render_max_ms": round(self.render_max * 1000, 1),
+                "timeout_seconds": self.timeout,
+            }
+
+pdf_service = PdfService(PDF_WORKERS, PDF_JOB_TIMEOUT, PDF_QUEUE_MAX)
@@ -0,0 +1,329 @@
+from sqlalchemy import select, update, func, or_, and_
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.orm.exc import ObjectDeletedError, StaleDataError
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from xml.etree import ElementTree
+import logging
+import os
+import sys
+import threading
+import zipfile
+
+try:
+    import pymupdf
+except ImportError:  # Optional (AGPL, requirements-pdf.txt): without it PDF jobs are skipped and can be re-queued later
+    pymupdf = None
+
+from database import SessionLocal
+from models import Document, DocumentJob
+import storage
+
+# Background document processing: text extraction, page counts and first-page thumbnails.
+#
+# Uploads only enqueue a row in document_jobs; DOC_WORKERS threads claim jobs from that
+# table, so queued work survives restarts and is shared by every uvicorn worker. A job is
+# claimed with a conditional UPDATE (plus SKIP LOCKED on PostgreSQL); a job left "running"
+# longer than DOC_JOB_LEASE by a crashed process is picked up again. Extraction runs
+# outside any transaction. The extracted text goes into documents.text_content, which the
+# search index picks up through its flush hook.
+#
+# Deleting a document deletes its job with it, possibly while the job runs. Results are
+# written after re-reading the job FOR UPDATE, so on PostgreSQL a concurrent delete either
+# already happened (the job is gone and nothing is written) or waits for our commit. SQLite
+# has no row locks; a delete that lands between the read and the commit shows up as a stale
+# update, which is dropped the same way.
+
+logger = logging.getLogger(__name__)
+
+DOC_WORKERS = int(os.getenv("DOC_WORKERS", "1"))
+DOC_POLL_INTERVAL = float(os.getenv("DOC_POLL_INTERVAL", "10"))
+DOC_JOB_MAX_ATTEMPTS = 3
+DOC_JOB_LEASE = timedelta(minutes=10)
+MAX_TEXT_CHARS = 200_000  # Enough for search; keeps tsvector and FTS rows a sane size
+MAX_XML_BYTES = 50 * 1024 * 1024
+THUMBNAIL_WIDTH = 240
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+APP_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/extended-properties}"
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EXTRACTION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class Unsupported(Exception):
+    """No extractor is installed for the file; retrying would not help"""
+
+def extract(path: str, mime_type: str, filename: str) -> dict:
+    """text, page_count and thumbnail (PNG bytes) of a file; missing keys mean not applicable"""
+    ext = os.path.splitext(filename)[1].lower()
+    if mime_type == "application/pdf" or ext == ".pdf":
+        return _extract_pdf(path)
+    if mime_type == DOCX_MIME or ext == ".docx":
+        return _extract_docx(path)
+    if mime_type.startswith("text/") or ext in (".txt", ".csv", ".md"):
+        with open(path, "rb") as f:
+            return {"text": f.read(MAX_TEXT_CHARS * 4).decode("utf-8", errors="replace")}
+    return {}
+
+def _extract_pdf(path: str) -> dict:
+    if pymupdf is None:
+        raise Unsupported("PyMuPDF is not installed")
+    with pymupdf.open(path) as pdf:
+        parts, length = [], 0
+        for page in pdf:
+            if length >= MAX_TEXT_CHARS:
+                break
+            text = page.get_text()
+            parts.append(text)
+            length += len(text)
+        result = {"text": "".join(parts), "page_count": pdf.page_count}
+        if pdf.page_count:
+            first = pdf[0]
+            zoom = THUMBNAIL_WIDTH / first.rect.width
+            result["thumbnail"] = first.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False).tobytes("png")
+    return result
+
+def _extract_docx(path: str) -> dict:
+    with zipfile.ZipFile(path) as docx:
+        if docx.getinfo("word/document.xml").file_size > MAX_XML_BYTES:
+            raise ValueError("word/document.xml is too large")
+        root = ElementTree.fromstring(docx.read("word/document.xml"))
+        paragraphs = ["".join(t.text or "" for t in p.iter(f"{WORD_NS}t")) for p in root.iter(f"{WORD_NS}p")]
+        result = {"text": "\n".join(p for p in paragraphs if p)}
+        # Word stores the page count it last rendered; other editors may leave it out
+        if "docProps/app.xml" in docx.namelist():
+            pages = ElementTree.fromstring(docx.read("docProps/app.xml")).find(f"{APP_NS}Pages")
+            if pages is not None and (pages.text or "").isdigit():
+                result["page_count"] = int(pages.text)
+    return result
+
+def _write_thumbnail(content_hash: str, data: bytes):
+    path = storage.thumbnail_path(content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{threading.get_ident()}.part"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# QUEUE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def enqueue(db: Session, doc: Document):
+    """Queue processing for doc in the caller's transaction"""
+    doc.processing_status = "pending"
+    db.add(DocumentJob(document=doc))
+
+def _claimable(now: datetime):
+    return or_(
+        DocumentJob.status == "queued",
+        and_(DocumentJob.status == "running", DocumentJob.started_at < now - DOC_JOB_LEASE),
+    )
+
+def claim(db: Session) -> Optional[int]:
+    """Mark the oldest claimable job running and return its id, or None when the queue is empty"""
+    while True:
+        now = datetime.now(timezone.utc)
+        job_id = db.scalars(
+            select(DocumentJob.id).where(_claimable(now)).order_by(DocumentJob.id).limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if job_id is None:
+            db.rollback()
+            return None
+        # Conditional so that two workers racing for the same row cannot both win it
+        claimed = db.execute(
+            update(DocumentJob).where(DocumentJob.id == job_id, _claimable(now))
+            .values(status="running", started_at=now, attempts=DocumentJob.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return job_id
+
+def _results_from_twin(db: Session, doc: Document) -> Optional[dict]:
+    """Results of an already processed document with the same bytes, if there is one"""
+    if doc.content_hash is None:
+        return None
+    twin = db.scalars(
+        select(Document).options(undefer(Document.text_content))
+        .where(Document.content_hash == doc.content_hash, Document.id != doc.id, Document.processing_status == "done")
+        .limit(1)
+    ).first()
+    if twin is None:
+        return None
+    return {"text": twin.text_content, "page_count": twin.page_count, "has_thumbnail": twin.has_thumbnail}
+
+def _locked_job(db: Session, job_id: int) -> Optional[DocumentJob]:
+    """Re-read the job and lock it; None when it was deleted along with its document"""
+    return db.get(DocumentJob, job_id, with_for_update=True, populate_existing=True)
+
+@contextmanager
+def _unless_deleted(db: Session):
+    """Drop the write when the job's document is deleted before it commits"""
+    try:
+        yield
+    except (StaleDataError, ObjectDeletedError):
+        db.rollback()
+
+def process_job(job_id: int):
+    """Run one claimed job; the document may have been deleted in the meantime"""
+    with SessionLocal() as db:
+        job = db.get(DocumentJob, job_id)
+        if job is None:
+            return
+        doc = job.document
+        result = _results_from_twin(db, doc)
+        path, mime_type, filename, content_hash = doc.file_path, doc.mime_type, doc.original_filename, doc.content_hash
+        db.rollback()  # Do not hold a transaction open while extracting
+
+        if result is None:
+            extracted = extract(path, mime_type, filename)
+            result = {"text": extracted.get("text"), "page_count": extracted.get("page_count"), "has_thumbnail": False}
+            if extracted.get("thumbnail") and content_hash:
+                _write_thumbnail(content_hash, extracted["thumbnail"])
+                result["has_thumbnail"] = True
+
+        with _unless_deleted(db):
+            job = _locked_job(db, job_id)
+            if job is None:
+                return
+            text = (result["text"] or "").replace("\x00", "")[:MAX_TEXT_CHARS]  # PostgreSQL rejects NUL in text
+            job.document.text_content = text or None
+            job.document.page_count = result["page_count"]
+            job.document.has_thumbnail = result["has_thumbnail"]
+            job.document.processing_status = "done"
+            job.status, job.error, job.finished_at = "done", None, datetime.now(timezone.utc)
+            db.commit()
+
+def fail_job(job_id: int, error: str, retry: bool = True):
+    """Re-queue the job, or give up on it after DOC_JOB_MAX_ATTEMPTS; retry=False marks it skipped"""
+    with SessionLocal() as db, _unless_deleted(db):
+        job = _locked_job(db, job_id)
+        if job is None:
+            return
+        job.error = error[:1000]
+        job.finished_at = datetime.now(timezone.utc)
+        if not retry:
+            job.status = "skipped"
+            job.document.processing_status = "unsupported"
+        elif job.attempts < DOC_JOB_MAX_ATTEMPTS:
+            job.status = "queued"
+        else:
+            job.status = "failed"
+            job.document.processing_status = "failed"
+        db.commit()
+
+def queue_stats(db: Session) -> dict:
+    counts = dict(db.execute(select(DocumentJob.status, func.count()).group_by(DocumentJob.status)).all())
+    return {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed", "skipped")}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# WORKERS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class DocumentProcessor:
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"document-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self, timeout: float = 10):
+        """Stop taking jobs; one still running is retried after DOC_JOB_LEASE if it does not finish"""
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def notify(self):
+        """Wake idle workers after enqueueing, instead of waiting for the next poll"""
+        self._wake.set()
+
+    def run_once(self) -> bool:
+        """Process one job; False when there was nothing to do"""
+        with SessionLocal() as db:
+            job_id = claim(db)
+        if job_id is None:
+            return False
+        try:
+            process_job(job_id)
+            with self._lock:
+                self.processed += 1
+        except Unsupported as e:
+            fail_job(job_id, str(e), retry=False)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            fail_job(job_id, f"{type(e).__name__}: {e}")
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                logger.exception("Document worker failed to claim a job")
+                busy = False
+            if not busy:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def stats(self, db: Session) -> dict:
+        with self._lock:
+            local = {"workers": len(self._threads), "processed": self.processed, "failed": self.failed}
+        return {**local, "pdf_support": pymupdf is not None, "jobs": queue_stats(db)}
+
+document_processor = DocumentProcessor(DOC_WORKERS, DOC_POLL_INTERVAL)
+
+if __name__ == "__main__":
+    from database import engine
+    import migrations
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command not in ("enqueue", "run", "retry"):
+        sys.exit("Usage: python processing.py [enqueue|run|retry]")
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        if command == "enqueue":
+            # Documents that were never processed, e.g. adopted with `storage.py adopt`
+            docs = db.scalars(select(Document).where(Document.processing_status == None)).all()
+            for doc in docs:
+                enqueue(db, doc)
+            db.commit()
+            print(f"Queued {len(docs)} documents")
+        elif command == "retry":
+            # Skipped jobs too, e.g. PDFs after installing PyMuPDF
+            failed = db.scalars(select(DocumentJob).where(DocumentJob.status.in_(["failed", "skipped"]))).all()
+            for job in failed:
+                job.status, job.attempts = "queued", 0
+                job.document.processing_status = "pending"
+            db.commit()
+            print(f"Re-queued {len(failed)} failed or skipped jobs")
+        else:
+            count = 0
+            while document_processor.run_once():
+                count += 1
+            print(f"Ran {count} jobs: {document_processor.processed} done, {document_processor.failed} failed")
+    finally:
+        db.close()
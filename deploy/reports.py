@@ -0,0 +1,107 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, select
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+import os
+
+from models import Client, Matter, MatterStatus, TimeEntry
+from cache import TTLCache
+
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+dashboard_cache = TTLCache(ttl=DASHBOARD_CACHE_TTL, maxsize=8)
+
+def sum_where(db: Session, expr, condition):
+    """SUM(expr) FILTER (WHERE condition), or the CASE equivalent on SQLite"""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.coalesce(func.sum(case((condition, expr), else_=0)), 0)
+    return func.coalesce(func.sum(expr).filter(condition), 0)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DASHBOARD
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def dashboard_select(db: Session, today: date):
+    """All dashboard figures as a single aggregate query over the recent time entries"""
+    week_ago = today - timedelta(days=7)
+    month_start = today.replace(day=1)
+    active_matters = select(func.count(Matter.id)).where(Matter.status == MatterStatus.active).scalar_subquery()
+    return select(
+        sum_where(db, TimeEntry.hours, TimeEntry.date == today).label("today_hours"),
+        sum_where(db, TimeEntry.hours, TimeEntry.date >= week_ago).label("week_hours"),
+        sum_where(db, TimeEntry.hours * TimeEntry.rate, (TimeEntry.date >= month_start) & (TimeEntry.billable == True)).label("month_billable"),
+        active_matters.label("active_matters"),
+    ).where(TimeEntry.date >= min(week_ago, month_start))
+
+def dashboard_stats(db: Session, today: date) -> dict:
+    return dict(db.execute(dashboard_select(db, today)).mappings().one())
+
+def cached_dashboard_stats(db: Session) -> dict:
+    today = date.today()
+    return dashboard_cache.get_or_set(today, lambda: dashboard_stats(db, today))
+
+def invalidate_dashboard():
+    dashboard_cache.invalidate()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PERIOD REPORTS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+BILLABLE_LABELS = {"true": "Laskutettava", "false": "Ei laskutettava"}
+
+def month_range(year: int, month: int) -> Tuple[date, date]:
+    """Half-open [start, end) range covering one calendar month"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+def matter_report_select(start: date, end: date, client_id: Optional[int] = None):
+    """Per-matter hours and billable amount for entries in [start, end) as one grouped query"""
+    billable = TimeEntry.billable == True
+    stmt = select(
+        Matter.id.label("matter_id"),
+        Matter.reference,
+        Matter.title,
+        Matter.matter_type,
+        Client.id.label("client_id"),
+        Client.name.label("client_name"),
+        func.sum(TimeEntry.hours).label("hours"),
+        func.coalesce(func.sum(case((billable, TimeEntry.hours), else_=0)), 0).label("billable_hours"),
+        func.coalesce(func.sum(case((billable, TimeEntry.hours * TimeEntry.rate), else_=0)), 0).label("amount"),
+    ).select_from(TimeEntry) \
+        .join(Matter, Matter.id == TimeEntry.matter_id) \
+        .join(Client, Client.id == Matter.client_id) \
+        .where(TimeEntry.date >= start, TimeEntry.date < end) \
+        .group_by(Matter.id, Matter.reference, Matter.title, Matter.matter_type, Client.id, Client.name) \
+        .order_by(Matter.reference)
+    if client_id:
+        stmt = stmt.where(Matter.client_id == client_id)
+    return stmt
+
+def matter_report_rows(db: Session, start: date, end: date, client_id: Optional[int] = None) -> List[dict]:
+    return [dict(row) for row in db.execute(matter_report_select(start, end, client_id)).mappings()]
+
+def _add(group: dict, hours: float, billable_hours: float, amount: float):
+    group["hours"] += hours
+    group["billable_hours"] += billable_hours
+    group["amount"] += amount
+    group["matter_count"] += 1
+
+def group_rows(rows: List[dict], group_by: str) -> List[dict]:
+    """Roll per-matter rows up by client, matter type or billable flag"""
+    groups = {}
+    def group(key, label):
+        return groups.setdefault(key, {"key": key, "label": label, "hours": 0, "billable_hours": 0, "amount": 0, "matter_count": 0})
+    for r in rows:
+        if group_by == "client":
+            _add(group(str(r["client_id"]), r["client_name"]), r["hours"], r["billable_hours"], r["amount"])
+        elif group_by == "matter_type":
+            matter_type = r["matter_type"].value if r["matter_type"] else "other"
+            _add(group(matter_type, matter_type), r["hours"], r["billable_hours"], r["amount"])
+        elif group_by == "billable":
+            if r["billable_hours"]:
+                _add(group("true", BILLABLE_LABELS["true"]), r["billable_hours"], r["billable_hours"], r["amount"])
+            if r["hours"] - r["billable_hours"]:
+                _add(group("false", BILLABLE_LABELS["false"]), r["hours"] - r["billable_hours"], 0, 0)
+        else:
+            raise ValueError(f"Unknown grouping: {group_by}")
+    return sorted(groups.values(), key=lambda g: g["amount"], reverse=True)
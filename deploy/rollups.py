@@ -0,0 +1,182 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, select, update, delete, insert, bindparam
+from typing import List, Optional
+import sys
+
+from models import Matter, MatterTotal, TimeEntry
+
+# Columns compared by verify(); amounts may differ by float rounding up to DRIFT_TOLERANCE
+TOTAL_COLUMNS = ["total_hours", "billable_hours", "billable_amount", "unbilled_amount", "last_entry_date"]
+DRIFT_TOLERANCE = 0.005
+
+def totals_select(matter_ids=None):
+    """Grouped SELECT recomputing the rollup from time_entries, one row per matter"""
+    stmt = select(
+        TimeEntry.matter_id.label("matter_id"),
+        func.coalesce(func.sum(TimeEntry.hours), 0).label("total_hours"),
+        func.coalesce(func.sum(case((TimeEntry.billable == True, TimeEntry.hours), else_=0)), 0).label("billable_hours"),
+        func.coalesce(func.sum(case((TimeEntry.billable == True, TimeEntry.hours * TimeEntry.rate), else_=0)), 0).label("billable_amount"),
+        func.coalesce(func.sum(case(((TimeEntry.billable == True) & (TimeEntry.billed == False), TimeEntry.hours * TimeEntry.rate), else_=0)), 0).label("unbilled_amount"),
+        func.max(TimeEntry.date).label("last_entry_date"),
+    ).group_by(TimeEntry.matter_id)
+    if matter_ids is not None:
+        stmt = stmt.where(TimeEntry.matter_id.in_(matter_ids))
+    return stmt
+
+def _empty_row(matter_id: int) -> dict:
+    return {"matter_id": matter_id, "total_hours": 0, "billable_hours": 0, "billable_amount": 0, "unbilled_amount": 0, "last_entry_date": None}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INCREMENTAL MAINTENANCE (called inside the writing transaction)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def init_matter(db: Session, matter_id: int):
+    """Create the zero rollup row for a new matter"""
+    db.execute(insert(MatterTotal).values(**_empty_row(matter_id)))
+
+def _apply(db: Session, matter_id: int, values: dict):
+    result = db.execute(update(MatterTotal).where(MatterTotal.matter_id == matter_id).values(**values))
+    if result.rowcount == 0:
+        # Matter predates the rollup table; recompute it from scratch instead
+        rebuild_matters(db, [matter_id])
+
+def apply_time_entry(db: Session, entry: TimeEntry, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a single time entry; run after the entry is flushed"""
+    amount = entry.hours * entry.rate if entry.billable else 0
+    values = {
+        "total_hours": MatterTotal.total_hours + sign * entry.hours,
+        "billable_hours": MatterTotal.billable_hours + (sign * entry.hours if entry.billable else 0),
+        "billable_amount": MatterTotal.billable_amount + sign * amount,
+        "unbilled_amount": MatterTotal.unbilled_amount + (sign * amount if not entry.billed else 0),
+    }
+    if sign > 0:
+        values["last_entry_date"] = case(
+            ((MatterTotal.last_entry_date == None) | (MatterTotal.last_entry_date < entry.date), entry.date),
+            else_=MatterTotal.last_entry_date,
+        )
+    else:
+        values["last_entry_date"] = select(func.max(TimeEntry.date)).where(TimeEntry.matter_id == entry.matter_id).scalar_subquery()
+    _apply(db, entry.matter_id, values)
+
+def apply_invoice(db: Session, matter_id: int, billed_amount: float):
+    """Move billed_amount out of the matter's unbilled balance"""
+    _apply(db, matter_id, {"unbilled_amount": MatterTotal.unbilled_amount - billed_amount})
+
+def apply_invoices(db: Session, billed_amounts: dict):
+    """apply_invoice for many matters ({matter_id: amount}) as one executemany UPDATE"""
+    if not billed_amounts:
+        return
+    stmt = update(MatterTotal.__table__) \
+        .where(MatterTotal.matter_id == bindparam("m_id")) \
+        .values(unbilled_amount=MatterTotal.unbilled_amount - bindparam("m_amount"))
+    db.connection().execute(stmt, [{"m_id": m, "m_amount": a} for m, a in billed_amounts.items()])
+    existing = set(db.scalars(select(MatterTotal.matter_id).where(MatterTotal.matter_id.in_(list(billed_amounts)))))
+    missing = [m for m in billed_amounts if m not in existing]
+    if missing:
+        rebuild_matters(db, missing)
+
+def apply_time_entries(db: Session, entries: List[dict]):
+    """apply_time_entry for many new entries (dicts of matter_id, date, hours, rate, billable, billed), one UPDATE per matter in one executemany"""
+    deltas = {}
+    for e in entries:
+        d = deltas.setdefault(e["matter_id"], {"m_id": e["matter_id"], "m_hours": 0.0, "m_billable_hours": 0.0, "m_amount": 0.0, "m_unbilled": 0.0, "m_date": e["date"]})
+        amount = e["hours"] * e["rate"] if e["billable"] else 0
+        d["m_hours"] += e["hours"]
+        d["m_billable_hours"] += e["hours"] if e["billable"] else 0
+        d["m_amount"] += amount
+        d["m_unbilled"] += amount if not e["billed"] else 0
+        d["m_date"] = max(d["m_date"], e["date"])
+    if not deltas:
+        return
+    stmt = update(MatterTotal.__table__).where(MatterTotal.matter_id == bindparam("m_id")).values(
+        total_hours=MatterTotal.total_hours + bindparam("m_hours"),
+        billable_hours=MatterTotal.billable_hours + bindparam("m_billable_hours"),
+        billable_amount=MatterTotal.billable_amount + bindparam("m_amount"),
+        unbilled_amount=MatterTotal.unbilled_amount + bindparam("m_unbilled"),
+        last_entry_date=case(
+            ((MatterTotal.last_entry_date == None) | (MatterTotal.last_entry_date < bindparam("m_date")), bindparam("m_date")),
+            else_=MatterTotal.last_entry_date,
+        ),
+    )
+    db.connection().execute(stmt, list(deltas.values()))
+    existing = set(db.scalars(select(MatterTotal.matter_id).where(MatterTotal.matter_id.in_(list(deltas)))))
+    missing = [m for m in deltas if m not in existing]
+    if missing:
+        rebuild_matters(db, missing)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REBUILD / VERIFY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def compute_totals(db: Session, matter_ids: Optional[List[int]] = None) -> dict:
+    """Recompute rollup rows from raw time entries, including zero rows for matters without entries"""
+    ids_query = db.query(Matter.id)
+    if matter_ids is not None:
+        ids_query = ids_query.filter(Matter.id.in_(matter_ids))
+    rows = {matter_id: _empty_row(matter_id) for (matter_id,) in ids_query}
+    for row in db.execute(totals_select(matter_ids)).mappings():
+        if row["matter_id"] in rows:
+            rows[row["matter_id"]] = dict(row)
+    return rows
+
+def rebuild_matters(db: Session, matter_ids: Optional[List[int]] = None) -> int:
+    rows = compute_totals(db, matter_ids)
+    stmt = delete(MatterTotal)
+    if matter_ids is not None:
+        stmt = stmt.where(MatterTotal.matter_id.in_(matter_ids))
+    db.execute(stmt)
+    if rows:
+        db.execute(insert(MatterTotal), list(rows.values()))
+    return len(rows)
+
+def ensure_populated(db: Session) -> int:
+    """Rebuild rollup rows for any matter that does not have one yet"""
+    missing = [matter_id for (matter_id,) in db.query(Matter.id).outerjoin(MatterTotal).filter(MatterTotal.matter_id == None)]
+    if not missing:
+        return 0
+    rebuild_matters(db, missing)
+    db.commit()
+    return len(missing)
+
+def verify(db: Session) -> List[dict]:
+    """Compare stored rollups with a from-scratch recomputation and return every drifting field"""
+    expected = compute_totals(db)
+    stored = {t.matter_id: t for t in db.query(MatterTotal)}
+    drift = []
+    for matter_id, row in expected.items():
+        current = stored.get(matter_id)
+        for column in TOTAL_COLUMNS:
+            actual = getattr(current, column) if current else None
+            wanted = row[column]
+            if isinstance(wanted, (int, float)) and actual is not None:
+                ok = abs(actual - wanted) <= DRIFT_TOLERANCE
+            else:
+                ok = actual == wanted
+            if not ok:
+                drift.append({"matter_id": matter_id, "column": column, "stored": actual, "expected": wanted})
+    for matter_id in stored.keys() - expected.keys():
+        drift.append({"matter_id": matter_id, "column": "*", "stored": "orphan", "expected": None})
+    return drift
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    import migrations
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command not in ("rebuild", "verify"):
+        sys.exit("Usage: python rollups.py [rebuild|verify]")
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        drift = verify(db)
+        for d in drift:
+            print(f"matter {d['matter_id']}: {d['column']} stored={d['stored']} expected={d['expected']}")
+        print(f"{len(drift)} drifting values")
+        if command == "rebuild":
+            count = rebuild_matters(db)
+            db.commit()
+            print(f"Rebuilt totals for {count} matters")
+        elif drift:
+            sys.exit(1)
+    finally:
+        db.close()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import date, datetime
 from enum import Enum
 
@@ -27,6 +27,21 @@ class DocumentType(str, Enum):
     invoice = "invoice"
     other = "other"
 
+class ReportGrouping(str, Enum):
+    client = "client"
+    matter_type = "matter_type"
+    billable = "billable"
+
+class ExportDataset(str, Enum):
+    time_entries = "time-entries"
+    invoices = "invoices"
+    matters = "matters"
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
+    xlsx = "xlsx"
+
 class InvoiceStatus(str, Enum):
     draft = "draft"
     sent = "sent"
@@ -117,6 +132,32 @@ class TimeEntryUpdate(BaseModel):
     rate: Optional[float] = None
     billed: Optional[bool] = None
 
+class TimeEntryImport(BaseModel):
+    """One row of a bulk import; the matter is given by id or by reference"""
+    matter_id: Optional[int] = None
+    matter_reference: Optional[str] = None
+    date: date
+    hours: float
+    description: str
+    billable: bool = True
+    rate: Optional[float] = None
+    billed: bool = False
+
+class BulkTimeEntryRequest(BaseModel):
+    entries: List[dict]
+    all_or_nothing: bool = True
+
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkTimeEntryReport(BaseModel):
+    received: int
+    inserted: int
+    ids: List[int]
+    errors: List[BulkRowError]
+    duration_seconds: float
+
 class TimeEntryResponse(TimeEntryBase):
     id: int
     billed: bool
@@ -140,6 +181,9 @@ class DocumentResponse(DocumentBase):
     file_size: int
     mime_type: str
     uploaded_at: datetime
+    processing_status: Optional[str] = None
+    page_count: Optional[int] = None
+    has_thumbnail: Optional[bool] = None
     
     class Config:
         from_attributes = True
@@ -174,6 +218,36 @@ class InvoiceStatusUpdate(BaseModel):
     status: InvoiceStatus
     paid_date: Optional[date] = None
 
+class BatchInvoiceRequest(BaseModel):
+    start_date: date
+    end_date: date
+    client_id: Optional[int] = None
+    matter_type: Optional[MatterType] = None
+    due_days: int = 14
+    notes: Optional[str] = None
+    render_pdfs: bool = True
+
+class BatchInvoiceItem(BaseModel):
+    invoice_id: int
+    invoice_number: str
+    matter_id: int
+    entry_count: int
+    subtotal: float
+    total: float
+
+class BatchInvoiceReport(BaseModel):
+    start_date: date
+    end_date: date
+    invoices: List[BatchInvoiceItem]
+    invoice_count: int
+    entry_count: int
+    subtotal: float
+    total: float
+    errors: List[str]
+    pdfs_rendered: int
+    pdf_errors: List[str]
+    duration_seconds: float
+
 # Report schemas
 class MonthlyReportRequest(BaseModel):
     year: int
@@ -189,6 +263,14 @@ class MatterReportItem(BaseModel):
     billable_hours: float
     amount: float
 
+class ReportGroupItem(BaseModel):
+    key: str
+    label: str
+    hours: float
+    billable_hours: float
+    amount: float
+    matter_count: int
+
 class MonthlyReport(BaseModel):
     year: int
     month: int
@@ -196,6 +278,9 @@ class MonthlyReport(BaseModel):
     billable_hours: float
     total_amount: float
     matters: List[MatterReportItem]
+    client_id: Optional[int] = None
+    group_by: Optional[ReportGrouping] = None
+    groups: Optional[List[ReportGroupItem]] = None
 
 class ClientStatement(BaseModel):
     client: ClientResponse
@@ -206,6 +291,38 @@ class ClientStatement(BaseModel):
     total_amount: float
     invoiced_amount: float
     outstanding_amount: float
+    invoice_count: int = 0
+    billed_amount: float = 0
+    paid_amount: float = 0
+    unbilled_amount: float = 0
+
+# Startup schemas
+class Bootstrap(BaseModel):
+    matters: List[MatterResponse]
+    clients: List[ClientResponse]
+    time_entries: List[TimeEntryResponse]
+    dashboard: dict
+    sync_token: int
+
+class SyncResponse(BaseModel):
+    token: int
+    more: bool
+    clients: List[ClientResponse]
+    matters: List[MatterResponse]
+    time_entries: List[TimeEntryResponse]
+    invoices: List[InvoiceResponse]
+    documents: List[DocumentResponse]
+    deleted: Dict[str, List[int]]
+    dashboard: Optional[dict] = None
+
+# Search schemas
+class SearchResult(BaseModel):
+    entity_type: str
+    entity_id: int
+    matter_id: Optional[int] = None
+    title: str
+    snippet: Optional[str] = None
+    rank: float
 
 # User/Auth schemas
 class UserCreate(BaseModel):
@@ -0,0 +1,167 @@
+from sqlalchemy import event, select, delete, insert, or_, func, literal_column, text, inspect, table, column
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, undefer
+from typing import Iterable, List, Optional
+import re
+
+from models import Client, Matter, TimeEntry, Document, SearchDocument
+
+# Full-text search over clients, matters, time entries and documents.
+#
+# Every searchable record has one row in search_documents (title + body). The row is
+# rewritten in the same flush as the record itself by the after_flush hook below, so the
+# index never lags behind the data. Matching and ranking run on the backend's own index:
+# tsvector/GIN with Finnish stemming on PostgreSQL, FTS5 with bm25 on SQLite.
+
+TS_CONFIG = "finnish"
+FTS_TABLE = "search_fts"
+ENTITY_TYPES = ("client", "matter", "time_entry", "document")
+
+# Attributes that feed the index; edits to anything else do not trigger a reindex
+INDEXED_FIELDS = {
+    Client: ("name", "business_id"),
+    Matter: ("reference", "title", "description"),
+    TimeEntry: ("description", "matter_id"),
+    Document: ("original_filename", "description", "text_content", "matter_id"),
+}
+ENTITY_TYPE_OF = {Client: "client", Matter: "matter", TimeEntry: "time_entry", Document: "document"}
+
+def document_row(obj) -> dict:
+    """search_documents values for a client, matter, time entry or document"""
+    if isinstance(obj, Client):
+        return {"entity_type": "client", "entity_id": obj.id, "matter_id": None, "title": obj.name, "body": obj.business_id}
+    if isinstance(obj, Matter):
+        return {"entity_type": "matter", "entity_id": obj.id, "matter_id": obj.id, "title": f"{obj.reference} {obj.title}", "body": obj.description}
+    if isinstance(obj, TimeEntry):
+        return time_entry_row(obj.id, obj.matter_id, obj.description)
+    if isinstance(obj, Document):
+        body = "\n".join(part for part in (obj.description, obj.text_content) if part)
+        return {"entity_type": "document", "entity_id": obj.id, "matter_id": obj.matter_id, "title": obj.original_filename, "body": body or None}
+    raise TypeError(type(obj))
+
+def time_entry_row(entry_id: int, matter_id: int, description: str) -> dict:
+    """Search row for a time entry inserted without the ORM (bulk import)"""
+    return {"entity_type": "time_entry", "entity_id": entry_id, "matter_id": matter_id, "title": description[:200], "body": description}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INDEX MAINTENANCE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def index_rows(conn: Connection, rows: List[dict]):
+    """Insert or replace search rows; used by the flush hook and by bulk write paths"""
+    if not rows:
+        return
+    remove(conn, [(r["entity_type"], r["entity_id"]) for r in rows])
+    conn.execute(insert(SearchDocument), rows)
+
+def remove(conn: Connection, keys: Iterable[tuple]):
+    by_type = {}
+    for entity_type, entity_id in keys:
+        by_type.setdefault(entity_type, []).append(entity_id)
+    for entity_type, ids in by_type.items():
+        conn.execute(delete(SearchDocument).where(SearchDocument.entity_type == entity_type, SearchDocument.entity_id.in_(ids)))
+
+def _changed(obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in INDEXED_FIELDS[type(obj)])
+
+@event.listens_for(Session, "after_flush")
+def _reindex_on_flush(session: Session, flush_context):
+    rows = [document_row(o) for o in session.new if type(o) in INDEXED_FIELDS]
+    rows += [document_row(o) for o in session.dirty if type(o) in INDEXED_FIELDS and _changed(o)]
+    removed = [(ENTITY_TYPE_OF[type(o)], o.id) for o in session.deleted if type(o) in INDEXED_FIELDS]
+    if rows or removed:
+        conn = session.connection()
+        remove(conn, removed)
+        index_rows(conn, rows)
+
+def reindex_all(conn: Connection, batch_size: int = 1000) -> int:
+    """Rebuild search_documents from scratch"""
+    conn.execute(delete(SearchDocument))
+    count = 0
+    with Session(bind=conn) as session:
+        for model in INDEXED_FIELDS:
+            result = session.execute(select(model).options(undefer("*")).execution_options(yield_per=batch_size))
+            for batch in result.scalars().partitions():
+                conn.execute(insert(SearchDocument), [document_row(o) for o in batch])
+                count += len(batch)
+    return count
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SCHEMA (called from migrations.py)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def create_index(conn: Connection):
+    """Backend-specific full-text index over search_documents"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            f"ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce(body, '')), 'B')) STORED"
+        ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)"))
+    elif conn.dialect.name == "sqlite" and fts5_available(conn):
+        # External-content FTS5 table kept in sync with search_documents by triggers
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"title, body, content='search_documents', content_rowid='id', tokenize='unicode61', prefix='2 3')"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+            f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+        )
+
+def fts5_available(conn: Connection) -> bool:
+    return bool(conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+def _has_fts_table(conn: Connection) -> bool:
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first() is not None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# QUERYING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())[:10]
+
+def search(db: Session, query: str, entity_types: Optional[List[str]] = None, limit: int = 20) -> List[dict]:
+    """Ranked matches for every word of `query`, each treated as a prefix"""
+    terms = _terms(query)
+    if not terms:
+        return []
+    conn = db.connection()
+    columns = [SearchDocument.entity_type, SearchDocument.entity_id, SearchDocument.matter_id, SearchDocument.title]
+    if conn.dialect.name == "postgresql":
+        tsquery = func.to_tsquery(TS_CONFIG, " & ".join(f"{t}:*" for t in terms))
+        tsv = literal_column("search_documents.tsv")
+        rank = func.ts_rank_cd(tsv, tsquery)
+        snippet = func.ts_headline(TS_CONFIG, func.coalesce(SearchDocument.body, SearchDocument.title), tsquery, "MaxWords=20, MinWords=8")
+        stmt = select(*columns, snippet.label("snippet"), rank.label("rank")).where(tsv.op("@@")(tsquery)).order_by(rank.desc())
+    elif conn.dialect.name == "sqlite" and _has_fts_table(conn):
+        fts = literal_column(FTS_TABLE)
+        fts_rows = table(FTS_TABLE, column("rowid"))
+        match = " ".join(f'"{t}"*' for t in terms)
+        rank = func.bm25(fts, 10.0, 1.0)
+        snippet = func.snippet(fts, 1, "<b>", "</b>", "…", 12)
+        stmt = select(*columns, snippet.label("snippet"), (-rank).label("rank")) \
+            .select_from(SearchDocument) \
+            .join(fts_rows, fts_rows.c.rowid == SearchDocument.id) \
+            .where(fts.op("MATCH")(match)).order_by(rank)
+    else:
+        # No full-text support compiled in: fall back to a substring scan
+        conditions = [or_(SearchDocument.title.ilike(f"%{t}%"), SearchDocument.body.ilike(f"%{t}%")) for t in terms]
+        stmt = select(*columns, SearchDocument.body.label("snippet"), literal_column("0").label("rank")).where(*conditions)
+    if entity_types:
+        stmt = stmt.where(SearchDocument.entity_type.in_(entity_types))
+    return [dict(row) for row in db.execute(stmt.limit(limit)).mappings()]
@@ -0,0 +1,76 @@
+from sqlalchemy import select, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from typing import List
+import re
+import threading
+
+from models import Matter, Invoice, NumberSequence
+
+# Gapless per-year counters for matter references and invoice numbers.
+#
+# A number is taken with a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING on the
+# counter row. On PostgreSQL that row stays locked until the caller's transaction ends, so
+# concurrent allocations queue behind each other and a rolled-back invoice gives its number
+# back. SQLite has one writer at a time anyway; serialized() additionally keeps a process's
+# threads from interleaving allocating transactions, which SQLite would reject as busy.
+
+FORMATS = {
+    "matter": ("KH", 3),
+    "invoice": ("INV", 4),
+}
+
+_sqlite_writer = threading.RLock()
+
+@contextmanager
+def serialized(db: Session):
+    """Wrap a whole allocating transaction (up to commit) on SQLite; no-op on PostgreSQL"""
+    if db.get_bind().dialect.name != "sqlite":
+        yield
+        return
+    with _sqlite_writer:
+        yield
+
+def next_value(db: Session, name: str, year: int, count: int = 1) -> int:
+    """Advance the counter by `count` and return the last value taken"""
+    dialect = db.get_bind().dialect.name
+    upsert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = upsert(NumberSequence).values(name=name, year=year, last_value=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[NumberSequence.name, NumberSequence.year],
+        set_={"last_value": NumberSequence.last_value + count},
+    ).returning(NumberSequence.last_value)
+    return db.execute(stmt).scalar_one()
+
+def format_number(name: str, year: int, value: int) -> str:
+    prefix, width = FORMATS[name]
+    return f"{prefix}-{year}-{str(value).zfill(width)}"
+
+def next_number(db: Session, name: str, year: int) -> str:
+    return format_number(name, year, next_value(db, name, year))
+
+def next_numbers(db: Session, name: str, year: int, count: int) -> List[str]:
+    """A consecutive block of `count` numbers taken with a single counter update"""
+    if count <= 0:
+        return []
+    last = next_value(db, name, year, count)
+    return [format_number(name, year, value) for value in range(last - count + 1, last + 1)]
+
+def seed_from_existing(conn: Connection):
+    """Start each counter after the highest number already issued (compared numerically)"""
+    sources = {"matter": Matter.reference, "invoice": Invoice.invoice_number}
+    for name, column in sources.items():
+        prefix, _ = FORMATS[name]
+        pattern = re.compile(rf"^{prefix}-(\d{{4}})-(\d+)$")
+        highest = {}
+        for (value,) in conn.execute(select(column).where(column.like(f"{prefix}-%"))):
+            match = pattern.match(value or "")
+            if match:
+                year, number = int(match.group(1)), int(match.group(2))
+                highest[year] = max(highest.get(year, 0), number)
+        existing = {row.year for row in conn.execute(select(NumberSequence.year).where(NumberSequence.name == name))}
+        rows = [{"name": name, "year": year, "last_value": value} for year, value in highest.items() if year not in existing]
+        if rows:
+            conn.execute(insert(NumberSequence), rows)
@@ -0,0 +1,129 @@
+from fastapi.responses import Response
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import enum
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+from models import Client, Matter, MatterTotal, TimeEntry, Invoice, Document
+
+# Fast path for the hot list endpoints.
+#
+# Instead of loading ORM objects and building a Pydantic model per row (which FastAPI then
+# validates and serializes a second time through response_model), these endpoints select
+# plain columns, turn each row tuple into a dict and encode the list with orjson. The field
+# order and value formats match the Pydantic response models (UTC timestamps end in "Z", as
+# Pydantic writes them), so the JSON is the same and the models stay as the documented
+# response schema. Large JSON and text responses are gzipped.
+
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+UNBUFFERED_TYPES = ("text/event-stream",)  # Gzip would hold events back until its buffer fills
+
+def _default(value):
+    if isinstance(value, datetime) and value.utcoffset() == timedelta(0):
+        return value.isoformat().replace("+00:00", "Z")
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSON response for plain dicts and lists of dicts, encoded with orjson when installed"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZip for JSON and text responses only; document downloads, PDFs and precompressed assets pass through"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _TextGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+class _TextGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message):
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            # Range-capable file downloads keep their bytes (and ETags) as stored
+            content_type = headers.get("content-type", "")
+            if "accept-ranges" in headers or not content_type.startswith(COMPRESSIBLE_TYPES) or content_type.startswith(UNBUFFERED_TYPES):
+                self.content_encoding_set = True  # Starlette's "leave the body alone" flag
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ROW SERIALIZERS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Field order follows the response models (base class fields first)
+CLIENT_FIELDS = ("name", "business_id", "email", "phone", "address", "contact_person", "notes", "id", "created_at")
+MATTER_FIELDS = (
+    "title", "description", "client_id", "status", "matter_type", "estimated_value", "hourly_rate",
+    "id", "reference", "opened_date", "closed_date", "created_at",
+)
+TIME_ENTRY_FIELDS = ("matter_id", "date", "hours", "description", "billable", "rate", "id", "billed", "invoice_id", "created_at")
+INVOICE_FIELDS = (
+    "id", "invoice_number", "matter_id", "issue_date", "due_date", "subtotal", "vat_rate", "vat_amount", "total",
+    "status", "paid_date", "notes", "created_at",
+)
+DOCUMENT_FIELDS = (
+    "document_type", "description", "id", "matter_id", "filename", "original_filename", "file_size", "mime_type",
+    "uploaded_at", "processing_status", "page_count", "has_thumbnail",
+)
+
+CLIENT_COLUMNS = [getattr(Client, field) for field in CLIENT_FIELDS]
+MATTER_COLUMNS = [getattr(Matter, field) for field in MATTER_FIELDS] + CLIENT_COLUMNS + [MatterTotal.total_hours, MatterTotal.billable_amount]
+TIME_ENTRY_COLUMNS = [getattr(TimeEntry, field) for field in TIME_ENTRY_FIELDS]
+INVOICE_COLUMNS = [getattr(Invoice, field) for field in INVOICE_FIELDS]
+DOCUMENT_COLUMNS = [getattr(Document, field) for field in DOCUMENT_FIELDS]
+
+_MATTER_END = len(MATTER_FIELDS)
+_CLIENT_END = _MATTER_END + len(CLIENT_FIELDS)
+
+def client_dict(row) -> dict:
+    """ClientResponse as a dict, from a row of CLIENT_COLUMNS"""
+    return dict(zip(CLIENT_FIELDS, row))
+
+def matter_dict(row) -> dict:
+    """MatterResponse as a dict, from a row of MATTER_COLUMNS"""
+    matter = dict(zip(MATTER_FIELDS, row[:_MATTER_END]))
+    client = row[_MATTER_END:_CLIENT_END]
+    matter["client"] = dict(zip(CLIENT_FIELDS, client)) if client[-2] is not None else None
+    matter["total_hours"] = row[_CLIENT_END] or 0.0
+    matter["total_billable"] = row[_CLIENT_END + 1] or 0.0
+    return matter
+
+def time_entry_dict(row) -> dict:
+    """TimeEntryResponse as a dict, from a row of TIME_ENTRY_COLUMNS"""
+    entry = dict(zip(TIME_ENTRY_FIELDS, row))
+    entry["amount"] = entry["hours"] * entry["rate"] if entry["billable"] else 0.0
+    return entry
+
+def invoice_dict(row) -> dict:
+    """InvoiceResponse (without its time entries) as a dict, from a row of INVOICE_COLUMNS"""
+    invoice = dict(zip(INVOICE_FIELDS, row))
+    invoice["time_entries"] = None
+    return invoice
+
+def document_dict(row) -> dict:
+    """DocumentResponse as a dict, from a row of DOCUMENT_COLUMNS"""
+    return dict(zip(DOCUMENT_FIELDS, row))
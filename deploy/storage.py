@@ -0,0 +1,371 @@
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import event, select, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import quote
+import aiofiles
+import aiofiles.os
+import hashlib
+import os
+import sys
+import time
+import uuid
+
+from cache import TTLCache
+from models import Document, StoredBlob
+from pdf_cache import not_modified
+
+# Content-addressed document storage.
+#
+# Uploads are streamed to UPLOAD_DIR/tmp while a SHA-256 is computed, then stored once as
+# UPLOAD_DIR/blobs/ab/cd/<sha256>. Documents point at the blob and stored_blobs counts the
+# references; the file is removed when the last document using it is deleted.
+#
+# File moves and unlinks happen inside the transaction that holds the blob row (upsert or
+# delete), so an upload and the deletion of the same content are serialised by the database:
+# the upload either sees the row gone and puts the file back, or keeps it alive.
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "250"))  # Room for 200 MB evidence bundles
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+MULTIPART_OVERHEAD = 64 * 1024  # Form fields and part headers around the file itself
+
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, "thumbnails")
+
+DOCUMENT_CACHE_TTL = float(os.getenv("DOCUMENT_CACHE_TTL", "60"))
+DOCUMENT_MAX_AGE = 24 * 3600  # Browser cache lifetime for content-addressed documents
+document_cache = TTLCache(ttl=DOCUMENT_CACHE_TTL, maxsize=4096)
+
+def too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Tiedosto on liian suuri (enintään {MAX_UPLOAD_MB:g} Mt)")
+
+def blob_path(content_hash: str) -> str:
+    return os.path.join(BLOB_DIR, content_hash[:2], content_hash[2:4], content_hash)
+
+def thumbnail_path(content_hash: str) -> str:
+    """First-page preview, shared like the blob itself (written by processing.py)"""
+    return os.path.join(THUMBNAIL_DIR, content_hash[:2], f"{content_hash}.png")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# UPLOAD
+# ═══════════════════════════════════════════════════════════════════════════════
+
+async def receive_upload(file: UploadFile) -> tuple:
+    """Stream an upload to a temp file; returns (temp path, size, sha256 hex). 413 past the limit."""
+    await aiofiles.os.makedirs(TMP_DIR, exist_ok=True)
+    temp_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise too_large()
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await discard(temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
+
+async def discard(temp_path: str):
+    try:
+        await aiofiles.os.remove(temp_path)
+    except FileNotFoundError:
+        pass
+
+def acquire_blob(db: Session, content_hash: str, size: int, temp_path: str) -> str:
+    """Take a reference on the blob for content_hash, moving temp_path into place if needed.
+
+    Must run inside the transaction that inserts the document; returns the blob path.
+    """
+    upsert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = upsert(StoredBlob).values(content_hash=content_hash, size=size, ref_count=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[StoredBlob.content_hash], set_={"ref_count": StoredBlob.ref_count + 1},
+    ))
+    path = blob_path(content_hash)
+    if os.path.exists(path):
+        os.remove(temp_path)  # Same bytes are already stored
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+    return path
+
+def _release(db: Session, doc: Document) -> Optional[str]:
+    """Drop doc's claim on its file; returns the file path if nothing else uses it any more"""
+    if doc.content_hash is None:
+        return doc.file_path  # Stored before deduplication, owned by this document alone
+    db.execute(update(StoredBlob).where(StoredBlob.content_hash == doc.content_hash).values(ref_count=StoredBlob.ref_count - 1))
+    removed = db.execute(
+        delete(StoredBlob).where(StoredBlob.content_hash == doc.content_hash, StoredBlob.ref_count <= 0)
+        .returning(StoredBlob.content_hash)
+    ).first()
+    return blob_path(doc.content_hash) if removed else None
+
+@contextmanager
+def releasing(db: Session, doc: Document):
+    """Wrap the deletion of doc up to its commit; the file goes once the commit succeeds.
+
+    The file is moved aside inside the transaction and put back if anything fails.
+    """
+    path = _release(db, doc)
+    trash_path = None
+    if path and os.path.exists(path):
+        os.makedirs(TMP_DIR, exist_ok=True)
+        trash_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.deleted")
+        os.replace(path, trash_path)
+    try:
+        yield
+    except BaseException:
+        if trash_path:
+            os.replace(trash_path, path)
+        raise
+    if trash_path:
+        _remove_file(trash_path)
+    if path and doc.content_hash:
+        _remove_file(thumbnail_path(doc.content_hash))
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DOWNLOAD
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Download metadata is cached per process so repeated downloads and revalidations skip the
+# database. A change to a document drops its entry once the change commits, whatever code
+# path made it; other workers keep theirs until it expires after DOCUMENT_CACHE_TTL. A
+# deleted document whose file is gone 404s at once; only one sharing its blob with another
+# document can still be downloaded from another worker for that long.
+
+@event.listens_for(Session, "after_flush")
+def _note_changed_documents(session: Session, flush_context):
+    ids = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, Document)}
+    if ids:
+        session.info.setdefault("changed_documents", set()).update(ids)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_documents(session: Session):
+    for document_id in session.info.pop("changed_documents", ()):
+        document_cache.invalidate(document_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_documents(session: Session):
+    session.info.pop("changed_documents", None)
+
+def document_meta(doc: Document) -> dict:
+    """What a download needs, small enough to keep in document_cache"""
+    return {"path": doc.file_path, "filename": doc.original_filename, "mime_type": doc.mime_type, "content_hash": doc.content_hash}
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """(first, last) byte of a single 'bytes=' range; None serves the whole file. 416 if unsatisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # Multiple ranges are allowed to be answered with the full file
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first.isdigit() or last.isdigit()) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None  # Malformed ranges are ignored
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return _unsatisfiable(size)
+        return max(size - suffix, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return _unsatisfiable(size)
+    return first, last
+
+def _unsatisfiable(size: int):
+    raise HTTPException(status_code=416, detail="Pyydetty alue ei ole tiedoston sisällä", headers={"Content-Range": f"bytes */{size}"})
+
+def _http_date(value: str) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def _if_range_matches(value: str, etag: str, mtime: int) -> bool:
+    if value.startswith('"'):
+        return value == etag  # Strong comparison only
+    return _http_date(value) == mtime
+
+async def _read_range(path: str, first: int, length: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(first)
+        while length > 0:
+            chunk = await f.read(min(UPLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+async def file_response(request: Request, document_id: int, meta: dict) -> Response:
+    """Download with ETag/Last-Modified revalidation and single byte-range (resumable) support"""
+    try:
+        stat = await aiofiles.os.stat(meta["path"])
+    except FileNotFoundError:
+        document_cache.invalidate(document_id)
+        raise HTTPException(status_code=404, detail="Asiakirjaa ei löydy")
+    size, mtime = stat.st_size, int(stat.st_mtime)
+    if meta["content_hash"]:
+        etag = f'"{meta["content_hash"]}"'
+        cache_control = f"private, max-age={DOCUMENT_MAX_AGE}"  # The bytes behind a document id never change
+    else:
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        cache_control = "private, no-cache"
+    headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True), "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+    if "if-none-match" in request.headers:
+        if not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+    elif "if-modified-since" in request.headers:
+        since = _http_date(request.headers["if-modified-since"])
+        if since is not None and mtime <= since:
+            return Response(status_code=304, headers=headers)
+
+    filename = quote(meta["filename"])
+    if filename != meta["filename"]:
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{filename}"
+    else:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    status_code, first, last = 200, 0, size - 1
+    range_header, if_range = request.headers.get("range"), request.headers.get("if-range")
+    if range_header and (if_range is None or _if_range_matches(if_range, etag, mtime)):
+        byte_range = _parse_range(range_header, size)
+        if byte_range:
+            status_code, (first, last) = 206, byte_range
+            headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    length = last - first + 1
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=meta["mime_type"])
+    return StreamingResponse(_read_range(meta["path"], first, length), status_code=status_code, headers=headers, media_type=meta["mime_type"])
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REQUEST SIZE LIMIT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized upload bodies before they are parsed and spooled to disk.
+
+    Starlette reads the whole multipart body before the endpoint runs, so the endpoint's
+    own check would only fire after the upload had been received in full.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD, path_suffix: str = "/documents"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_suffix = path_suffix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].endswith(self.path_suffix):
+            return await self.app(scope, receive, send)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            error = too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers={"Connection": "close"})
+            return await response(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAINTENANCE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def adopt_legacy(db: Session) -> tuple:
+    """Move documents stored before deduplication into blob storage; returns (adopted, missing)"""
+    adopted = missing = 0
+    os.makedirs(TMP_DIR, exist_ok=True)
+    ids = list(db.scalars(select(Document.id).where(Document.content_hash == None).order_by(Document.id)))
+    for doc_id in ids:
+        doc = db.get(Document, doc_id)
+        old_path = doc.file_path
+        if not os.path.exists(old_path):
+            missing += 1
+            continue
+        # Copy rather than move: the old path stays valid until the commit below
+        temp_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        size = 0
+        with open(old_path, "rb") as src, open(temp_path, "wb") as dst:
+            while chunk := src.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        doc.content_hash = digest.hexdigest()
+        doc.file_path = acquire_blob(db, doc.content_hash, size, temp_path)
+        db.commit()
+        _remove_file(old_path)
+        adopted += 1
+    return adopted, missing
+
+def collect_garbage(db: Session, min_age: float = 24 * 3600) -> tuple:
+    """Remove blob files and thumbnails no row refers to and abandoned temp files; returns (blobs, temps) removed.
+
+    Only files older than min_age are touched, so uploads still in flight are left alone.
+    """
+    known = set(db.scalars(select(StoredBlob.content_hash).where(StoredBlob.ref_count > 0)))
+    cutoff = time.time() - min_age
+    blobs = temps = 0
+    for root, _, files in os.walk(BLOB_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if name not in known and os.path.getmtime(path) < cutoff:
+                _remove_file(path)
+                blobs += 1
+    for root, _, files in os.walk(THUMBNAIL_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.removesuffix(".png") not in known and os.path.getmtime(path) < cutoff:
+                _remove_file(path)
+    if os.path.isdir(TMP_DIR):
+        for entry in os.scandir(TMP_DIR):
+            if entry.stat().st_mtime < cutoff:
+                _remove_file(entry.path)
+                temps += 1
+    db.execute(delete(StoredBlob).where(StoredBlob.ref_count <= 0))
+    db.commit()
+    return blobs, temps
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    import migrations
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command not in ("adopt", "gc"):
+        sys.exit("Usage: python storage.py [adopt|gc]")
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        if command == "adopt":
+            adopted, missing = adopt_legacy(db)
+            print(f"Moved {adopted} documents into blob storage, {missing} files missing")
+        else:
+            blobs, temps = collect_garbage(db)
+            print(f"Removed {blobs} unreferenced blobs and {temps} stale temp files")
+    finally:
+        db.close()
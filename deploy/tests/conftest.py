@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its settings and opens ./kh_legal_erp.db at import time, so point
+# everything at a scratch directory before any application module is imported.
+WORK_DIR = tempfile.mkdtemp(prefix="kh-erp-tests-")
+os.chdir(WORK_DIR)
+os.environ.pop("DATABASE_URL", None)
+os.environ.setdefault("UPLOAD_DIR", os.path.join(WORK_DIR, "uploads"))
+os.environ.setdefault("PDF_CACHE_DIR", os.path.join(WORK_DIR, "pdf_cache"))
+os.environ.setdefault("PDF_WORKERS", "0")
+os.environ.setdefault("DOC_WORKERS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+from database import SessionLocal
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def make_matter(client):
+    """Create a client and a matter through the API; returns the matter JSON"""
+    def make(title="Toimeksianto", **fields):
+        client_id = client.post("/api/clients", json={"name": f"Asiakas {title}"}).json()["id"]
+        response = client.post("/api/matters", json={"title": title, "client_id": client_id, **fields})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return make
+
+@pytest.fixture
+def add_entry(client):
+    def add(matter_id, hours=1.5, date="2024-03-15", billable=True, description="Työ", rate=250):
+        response = client.post("/api/time-entries", json={
+            "matter_id": matter_id, "date": date, "hours": hours, "description": description,
+            "billable": billable, "rate": rate,
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return add
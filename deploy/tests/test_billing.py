@@ -0,0 +1,35 @@
+from datetime import date
+
+import billing
+import rollups
+import ledger
+import sequences
+from models import Invoice, TimeEntry
+
+START, END = date(2022, 1, 1), date(2022, 1, 31)
+
+def test_batch_bills_only_locked_entries(db, make_matter, add_entry, monkeypatch):
+    matter = make_matter("Kuukausilaskutus", hourly_rate=200)
+    locked = add_entry(matter["id"], hours=2, rate=200, date="2022-01-10")
+    late_ids = []
+    take_numbers = sequences.next_numbers
+    def commit_entry_then_take_numbers(*args):
+        # Another request commits an entry for the same matter after the entries were locked
+        late_ids.append(add_entry(matter["id"], hours=5, rate=200, date="2022-01-20")["id"])
+        return take_numbers(*args)
+    monkeypatch.setattr(sequences, "next_numbers", commit_entry_then_take_numbers)
+
+    [summary] = billing.invoice_chunk(db, [matter["id"]], START, END, date(2022, 2, 1), date(2022, 2, 15))
+    assert summary["entry_count"] == 1 and summary["subtotal"] == 400
+    late = db.get(TimeEntry, late_ids[0])
+    assert not late.billed and late.invoice_id is None
+    billed = db.get(TimeEntry, locked["id"])
+    assert billed.billed and billed.invoice_id == summary["invoice_id"]
+    assert db.get(Invoice, summary["invoice_id"]).subtotal == 400
+    assert rollups.verify(db) == [] and ledger.verify(db) == []
+
+def test_manual_invoice_does_not_rebill_entries(client, make_matter, add_entry):
+    matter = make_matter("Käsilasku")
+    ids = [add_entry(matter["id"])["id"]]
+    assert client.post("/api/invoices", json={"matter_id": matter["id"], "time_entry_ids": ids}).status_code == 200
+    assert client.post("/api/invoices", json={"matter_id": matter["id"], "time_entry_ids": ids}).status_code == 400
@@ -0,0 +1,68 @@
+import pytest
+
+import main
+import storage
+from models import Document, StoredBlob
+
+CONTENT = b"0123456789" * 10
+
+@pytest.fixture
+def document(client, make_matter):
+    matter = make_matter("Lataukset")
+    response = client.post(f"/api/matters/{matter['id']}/documents", files={"file": ("muistio.txt", CONTENT, "text/plain")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def url(document):
+    return f"/api/documents/{document['id']}/download"
+
+def test_full_download(client, document):
+    response = client.get(url(document))
+    assert response.status_code == 200 and response.content == CONTENT
+    assert response.headers["Accept-Ranges"] == "bytes" and response.headers["Content-Length"] == str(len(CONTENT))
+
+def test_byte_range(client, document):
+    response = client.get(url(document), headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206 and response.content == CONTENT[10:20]
+    assert response.headers["Content-Range"] == f"bytes 10-19/{len(CONTENT)}"
+    response = client.get(url(document), headers={"Range": "bytes=-5"})
+    assert response.status_code == 206 and response.content == CONTENT[-5:]
+
+def test_unsatisfiable_range(client, document):
+    response = client.get(url(document), headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+def test_if_range_mismatch_sends_whole_file(client, document):
+    response = client.get(url(document), headers={"Range": "bytes=0-9", "If-Range": '"vanha"'})
+    assert response.status_code == 200 and response.content == CONTENT
+    etag = response.headers["ETag"]
+    assert client.get(url(document), headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+
+def test_revalidation(client, document):
+    etag = client.get(url(document)).headers["ETag"]
+    response = client.get(url(document), headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+
+def test_repeat_downloads_skip_the_database(client, document, monkeypatch):
+    loads = []
+    load = main.load_document_meta
+    monkeypatch.setattr(main, "load_document_meta", lambda db, document_id: loads.append(document_id) or load(db, document_id))
+    storage.document_cache.invalidate(document["id"])
+    etag = client.get(url(document)).headers["ETag"]
+    assert client.get(url(document), headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url(document), headers={"Range": "bytes=0-0"}).status_code == 206
+    assert loads == [document["id"]]
+
+def test_delete_outside_the_endpoint_drops_the_cache_entry(client, db, document):
+    assert client.get(url(document)).status_code == 200
+    assert storage.document_cache.get(document["id"]) is not None
+    doc = db.get(Document, document["id"])
+    content_hash, refs = doc.content_hash, db.get(StoredBlob, doc.content_hash).ref_count
+    with storage.releasing(db, doc):
+        db.delete(doc)
+        db.commit()
+    assert storage.document_cache.get(document["id"]) is None
+    blob = db.get(StoredBlob, content_hash)
+    assert (blob.ref_count if blob else 0) == refs - 1
+    assert client.get(url(document)).status_code == 404
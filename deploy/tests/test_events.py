@@ -0,0 +1,30 @@
+import asyncio
+
+from events import EventBus, SYNC_EVENT, format_event
+
+def test_delivery_overflow_and_unsubscribe():
+    async def scenario():
+        bus = EventBus(queue_size=3, heartbeat=0.05)
+        assert not bus.listening
+        bus.publish("time_entry", {"id": 1})  # Nobody listening: dropped at once
+        stream = bus.stream()
+        assert (await stream.__anext__()).startswith(b"retry:")
+        assert bus.listening
+
+        bus.publish("time_entry", {"id": 2})
+        await asyncio.sleep(0)
+        assert await stream.__anext__() == format_event("time_entry", {"id": 2})
+        assert await stream.__anext__() == b": ping\n\n"  # Heartbeat while idle
+
+        for i in range(10):  # More than the queue holds: the backlog collapses into one sync
+            bus.publish("time_entry", {"id": i})
+        await asyncio.sleep(0)
+        assert await stream.__anext__() == SYNC_EVENT
+        bus.publish("invoice", {"id": 7})
+        await asyncio.sleep(0)
+        assert await stream.__anext__() == format_event("invoice", {"id": 7})
+
+        await stream.aclose()
+        assert not bus.listening and bus.stats()["published"] == 12
+
+    asyncio.run(scenario())
@@ -0,0 +1,34 @@
+import csv
+import io
+import json
+
+def rows(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_filters_apply_per_dataset(client, make_matter, add_entry):
+    matter = make_matter("Vienti")
+    billed = add_entry(matter["id"], hours=2, date="2023-05-02")
+    add_entry(matter["id"], hours=1, date="2023-05-03")
+    invoice = client.post("/api/invoices", json={"matter_id": matter["id"], "time_entry_ids": [billed["id"]]}).json()
+    client.patch(f"/api/invoices/{invoice['id']}", json={"status": "paid"})
+    params = {"format": "jsonl", "matter_id": matter["id"]}
+
+    entries = rows(client.get("/api/exports/time-entries", params={**params, "billed": False}))
+    assert [e["hours"] for e in entries] == [1]
+    summary = rows(client.get("/api/exports/matters", params={**params, "billed": True}))
+    assert [s["hours"] for s in summary] == [2]
+    assert [i["invoice_number"] for i in rows(client.get("/api/exports/invoices", params={**params, "status": "paid"}))] == [invoice["invoice_number"]]
+    assert rows(client.get("/api/exports/invoices", params={**params, "status": "sent"})) == []
+
+def test_filter_that_does_not_apply_is_rejected(client):
+    assert client.get("/api/exports/invoices", params={"billed": True}).status_code == 400
+    assert client.get("/api/exports/time-entries", params={"status": "paid"}).status_code == 400
+    assert client.get("/api/exports/matters", params={"status": "paid"}).status_code == 400
+
+def test_csv_has_finnish_headings(client, make_matter, add_entry):
+    matter = make_matter("CSV")
+    add_entry(matter["id"])
+    response = client.get("/api/exports/time-entries", params={"matter_id": matter["id"]})
+    reader = csv.reader(io.StringIO(response.content.decode("utf-8-sig")), delimiter=";")
+    header, *data = list(reader)
+    assert header[:3] == ["id", "päivä", "toimeksianto"] and len(data) == 1
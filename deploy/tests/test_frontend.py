@@ -0,0 +1,24 @@
+def test_index_content_type(client):
+    for encoding in ("identity", "gzip"):
+        response = client.get("/", headers={"Accept-Encoding": encoding})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "text/html; charset=utf-8"
+        assert "<html" in response.text
+
+def test_index_revalidates(client):
+    etag = client.get("/").headers["ETag"]
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+
+def test_each_encoding_has_its_own_etag(client):
+    etags = {}
+    for encoding in ("identity", "gzip", "br"):
+        response = client.get("/", headers={"Accept-Encoding": encoding})
+        assert response.headers.get("content-encoding", "identity") in (encoding, "identity")
+        etags[response.headers.get("content-encoding", "identity")] = response.headers["ETag"]
+    assert len(set(etags.values())) == len(etags) >= 2
+    # A validator for the gzip body must not revalidate the identity body
+    response = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": etags["gzip"]})
+    assert response.status_code == 200
+    response = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": etags["gzip"]})
+    assert response.status_code == 304
@@ -0,0 +1,47 @@
+import imports
+import rollups
+
+def rows_for(matter):
+    return [
+        {"matter_id": matter["id"], "date": "2024-02-01", "hours": 2, "description": "Neuvottelu"},
+        {"matter_reference": matter["reference"], "date": "2024-02-02", "hours": 1.5, "description": "Muistio", "billable": False},
+        {"date": "2024-02-03", "hours": 1, "description": "Ei toimeksiantoa"},
+        {"matter_id": matter["id"], "date": "2024-02-04", "hours": 25, "description": "Liikaa"},
+        {"matter_id": matter["id"], "date": "2024-02-05", "hours": 1, "description": " "},
+        {"matter_id": 999999, "date": "2024-02-06", "hours": 1, "description": "Väärä"},
+        {"matter_id": matter["id"], "date": "ei päivä", "hours": 1, "description": "Päiväys"},
+    ]
+
+def import_(client, entries, all_or_nothing):
+    response = client.post("/api/time-entries/bulk", json={"entries": entries, "all_or_nothing": all_or_nothing})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_row_errors_are_reported_by_position(client, make_matter):
+    matter = make_matter("Tuonti")
+    report = import_(client, rows_for(matter), all_or_nothing=True)
+    assert report["received"] == 7 and report["inserted"] == 0 and report["ids"] == []
+    errors = {e["row"]: e["error"] for e in report["errors"]}
+    assert sorted(errors) == [3, 4, 5, 6, 7]
+    assert errors[3] == "matter_id tai matter_reference puuttuu"
+    assert errors[4].startswith("Tuntimäärän on oltava")
+    assert errors[5] == "Kuvaus puuttuu"
+    assert errors[6] == "Toimeksiantoa ei löydy"
+    assert errors[7].startswith("date:")
+    assert client.get("/api/time-entries", params={"matter_id": matter["id"]}).json() == []
+
+def test_partial_import_inserts_valid_rows(client, db, make_matter):
+    matter = make_matter("Osittainen tuonti")
+    report = import_(client, rows_for(matter), all_or_nothing=False)
+    assert report["inserted"] == 2 and len(report["errors"]) == 5
+    entries = client.get("/api/time-entries", params={"matter_id": matter["id"]}).json()
+    assert sorted(e["id"] for e in entries) == sorted(report["ids"])
+    assert sorted(e["rate"] for e in entries) == [0, matter["hourly_rate"]]  # Matter's rate; non-billable rows get 0
+    totals = client.get(f"/api/matters/{matter['id']}").json()
+    assert totals["total_hours"] == 3.5 and totals["total_billable"] == 2 * matter["hourly_rate"]
+    assert rollups.verify(db) == []
+
+def test_too_many_rows_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(imports, "BULK_MAX_ROWS", 1)
+    response = client.post("/api/time-entries/bulk", json={"entries": [{}, {}]})
+    assert response.status_code == 400
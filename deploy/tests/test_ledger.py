@@ -0,0 +1,33 @@
+import ledger
+
+def test_payment_and_reversal_keep_the_ledger_consistent(client, db, make_matter, add_entry):
+    matter = make_matter("Reskontra")
+    ids = [add_entry(matter["id"], hours=h, rate=200)["id"] for h in (2, 3)]
+    invoice = client.post("/api/invoices", json={"matter_id": matter["id"], "time_entry_ids": ids}).json()
+    statement_url = f"/api/clients/{matter['client_id']}/statement"
+    assert client.get(statement_url).json()["outstanding_amount"] == invoice["total"]
+
+    paid = client.patch(f"/api/invoices/{invoice['id']}", json={"status": "paid", "paid_date": "2024-04-01"}).json()
+    assert paid["paid_date"] == "2024-04-01"
+    statement = client.get(statement_url).json()
+    assert statement["paid_amount"] == invoice["total"] and statement["outstanding_amount"] == 0
+
+    reopened = client.patch(f"/api/invoices/{invoice['id']}", json={"status": "sent"}).json()
+    assert reopened["status"] == "sent" and reopened["paid_date"] is None
+    statement = client.get(statement_url).json()
+    assert statement["paid_amount"] == 0 and statement["outstanding_amount"] == invoice["total"]
+    assert statement["invoiced_amount"] == invoice["total"] and statement["invoice_count"] == 1
+    assert ledger.verify(db) == []
+
+def test_verify_reports_drift(client, db, make_matter, add_entry):
+    matter = make_matter("Reskontra drift")
+    entry = add_entry(matter["id"])
+    client.post("/api/invoices", json={"matter_id": matter["id"], "time_entry_ids": [entry["id"]]})
+    row = db.get(ledger.ClientLedger, matter["client_id"])
+    row.paid_amount += 10
+    db.commit()
+    drift = ledger.verify(db)
+    assert {"client_id": matter["client_id"], "column": "paid_amount", "stored": 10, "expected": 0} in drift
+    ledger.rebuild(db, [matter["client_id"]])
+    db.commit()
+    assert ledger.verify(db) == []
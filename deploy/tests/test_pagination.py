@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+import explain_queries
+import pagination
+from models import Matter, TimeEntry
+
+def test_cursor_round_trip():
+    cursor = pagination.encode_cursor([date(2024, 3, 15), 42])
+    assert pagination.decode_cursor(cursor, [TimeEntry.date, TimeEntry.id]) == [date(2024, 3, 15), 42]
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", pagination.encode_cursor([1])])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        pagination.decode_cursor(cursor, [Matter.opened_date, Matter.id])
+    assert error.value.status_code == 400
+
+def test_invalid_cursor_returns_400(client):
+    assert client.get("/api/time-entries", params={"cursor": "%%%"}).status_code == 400
+
+def test_time_entry_pages_cover_every_row_once(client, make_matter, add_entry):
+    matter = make_matter("Sivutus")
+    # Shared dates make the id the tie-breaker within a day
+    expected = {add_entry(matter["id"], date=f"2024-01-0{1 + i % 3}")["id"] for i in range(7)}
+
+    seen, cursor = [], None
+    while True:
+        params = {"matter_id": matter["id"], "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/time-entries", params=params)
+        assert response.status_code == 200
+        seen += [entry["id"] for entry in response.json()]
+        cursor = response.headers[pagination.NEXT_CURSOR_HEADER]
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) and set(seen) == expected
+
+def test_explain_covers_cursor_pages(db, make_matter, add_entry):
+    add_entry(make_matter("Explain")["id"])
+    names = []
+    for name, stmt in explain_queries.endpoint_queries(db, date.today()):
+        assert explain_queries.explain(db, stmt)
+        names.append(name)
+    assert {"list_matters(cursor)", "list_time_entries(cursor)"} <= set(names)
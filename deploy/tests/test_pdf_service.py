@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import pdf_service
+
+def _slow_render(kind, fields):
+    # Runs in the pool's child processes, which import it from this module
+    time.sleep(fields["seconds"])
+    return b"%PDF-slow", fields["seconds"]
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(pdf_service, "_render", _slow_render)
+    service = pdf_service.PdfService(workers=1, timeout=30, queue_max=4)
+    yield service
+    service.shutdown()
+
+def test_timeout_recycles_the_stuck_worker(service):
+    assert service.render("invoice", {"seconds": 0}) == b"%PDF-slow"  # Pool is up and warm
+    stuck = list(service._executor._processes.values())
+
+    service.timeout = 0.5
+    with pytest.raises(HTTPException) as error:
+        service.render("invoice", {"seconds": 60})
+    assert error.value.status_code == 504
+    for process in stuck:
+        process.join(10)
+        assert not process.is_alive()
+
+    service.timeout = 30
+    assert service.render("invoice", {"seconds": 0}) == b"%PDF-slow"
+    stats = service.stats()
+    assert stats["timeouts"] == 1 and stats["queue_depth"] == 0
+
+def test_async_timeout_recycles_the_stuck_worker(service):
+    async def scenario():
+        assert await service.render_async("invoice", {"seconds": 0}) == b"%PDF-slow"
+        stuck = list(service._executor._processes.values())
+
+        service.timeout = 0.5
+        with pytest.raises(HTTPException):
+            await service.render_async("invoice", {"seconds": 60})
+        for process in stuck:
+            process.join(10)
+            assert not process.is_alive()
+        service.timeout = 30
+        assert await service.render_async("invoice", {"seconds": 0}) == b"%PDF-slow"
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import processing
+from database import engine
+from models import Document, DocumentJob
+
+@pytest.fixture
+def upload(client, make_matter):
+    """Upload a text document; with DOC_WORKERS=0 its job stays queued until run_once()"""
+    matter = make_matter("Käsittely")
+    def upload(content=None, name="luonnos.txt"):
+        # Unique bytes by default: a document with an already processed twin copies its results
+        content = content or f"Sopimusluonnos\n{uuid.uuid4()}".encode()
+        response = client.post(f"/api/matters/{matter['id']}/documents", files={"file": (name, content, "text/plain")})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return upload
+
+def drain():
+    while processing.document_processor.run_once():
+        pass
+
+def job_of(db, document_id):
+    return db.query(DocumentJob).filter(DocumentJob.document_id == document_id).one_or_none()
+
+def test_text_document_is_processed(client, db, upload):
+    document = upload(b"Sopimusluonnos\nosapuolet")
+    assert document["processing_status"] == "pending"
+    drain()
+    doc = db.get(Document, document["id"])
+    assert doc.processing_status == "done" and doc.text_content == "Sopimusluonnos\nosapuolet"
+    assert job_of(db, document["id"]).status == "done"
+
+def test_failing_job_is_retried_then_failed(db, upload, monkeypatch):
+    def broken(path, mime_type, filename):
+        raise ValueError("rikki")
+    monkeypatch.setattr(processing, "extract", broken)
+    document = upload()
+    drain()
+    job = job_of(db, document["id"])
+    assert job.status == "failed" and job.attempts == processing.DOC_JOB_MAX_ATTEMPTS
+    assert job.error == "ValueError: rikki"
+    assert db.get(Document, document["id"]).processing_status == "failed"
+
+def test_pdf_without_pymupdf_is_skipped_without_retries(client, db, make_matter, monkeypatch):
+    monkeypatch.setattr(processing, "pymupdf", None)
+    matter = make_matter("PDF")
+    content = f"%PDF-1.4\n% {uuid.uuid4()}\n".encode()
+    response = client.post(f"/api/matters/{matter['id']}/documents", files={"file": ("kirje.pdf", content, "application/pdf")})
+    document = response.json()
+    drain()
+    job = job_of(db, document["id"])
+    assert job.status == "skipped" and job.attempts == 1 and job.error == "PyMuPDF is not installed"
+    assert db.get(Document, document["id"]).processing_status == "unsupported"
+    assert client.get("/api/system/documents").json()["jobs"]["skipped"] >= 1
+
+def test_document_deleted_during_extraction(client, db, upload, monkeypatch):
+    document = upload()
+    def extract_and_delete(path, mime_type, filename):
+        assert client.delete(f"/api/documents/{document['id']}").status_code == 200
+        return {"text": "liian myöhään"}
+    monkeypatch.setattr(processing, "extract", extract_and_delete)
+    drain()
+    assert db.get(Document, document["id"]) is None and job_of(db, document["id"]) is None
+
+def _delete_before_next_flush(document_id):
+    """Delete the document from another connection between the job's re-read and its commit"""
+    def delete(session, flush_context, instances):
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM document_jobs WHERE document_id = :id"), {"id": document_id})
+            conn.execute(text("DELETE FROM documents WHERE id = :id"), {"id": document_id})
+    event.listen(Session, "before_flush", delete, once=True)
+
+@pytest.mark.parametrize("outcome", ["done", "failed"])
+def test_document_deleted_before_commit(db, upload, monkeypatch, outcome):
+    document = upload()
+    job_id = job_of(db, document["id"]).id
+    db.rollback()
+    def extract(path, mime_type, filename):
+        _delete_before_next_flush(document["id"])
+        if outcome == "failed":
+            raise ValueError("rikki")
+        return {}
+    monkeypatch.setattr(processing, "extract", extract)
+    drain()
+    assert db.get(Document, document["id"]) is None and db.get(DocumentJob, job_id) is None
@@ -0,0 +1,27 @@
+from datetime import date
+
+import reports
+
+def test_dashboard_is_cached_until_invalidated(db):
+    reports.invalidate_dashboard()
+    stats = reports.cached_dashboard_stats(db)
+    assert reports.dashboard_cache.get(date.today()) == stats
+    reports.invalidate_dashboard()
+    assert reports.dashboard_cache.get(date.today()) is None
+
+def test_fill_racing_an_invalidation_is_not_stored(db, monkeypatch):
+    reports.invalidate_dashboard()
+    compute = reports.dashboard_stats
+    def fill_then_write(db, today):
+        stats = compute(db, today)
+        reports.invalidate_dashboard()  # A write commits while the figures are being computed
+        return stats
+    monkeypatch.setattr(reports, "dashboard_stats", fill_then_write)
+    reports.cached_dashboard_stats(db)
+    assert reports.dashboard_cache.get(date.today()) is None
+
+def test_new_entry_shows_on_dashboard(client, make_matter, add_entry):
+    before = client.get("/api/reports/dashboard").json()
+    add_entry(make_matter("Kojelauta")["id"], hours=2, date=date.today().isoformat())
+    after = client.get("/api/reports/dashboard").json()
+    assert after["today_hours"] == before["today_hours"] + 2
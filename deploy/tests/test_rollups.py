@@ -0,0 +1,31 @@
+import rollups
+
+def test_totals_follow_creates_and_deletes(client, db, make_matter, add_entry):
+    matter = make_matter("Rollup")
+    first = add_entry(matter["id"], hours=2, rate=200)
+    add_entry(matter["id"], hours=1, billable=False)
+    add_entry(matter["id"], hours=0.5, rate=300)
+    assert client.delete(f"/api/time-entries/{first['id']}").status_code == 200
+
+    totals = client.get(f"/api/matters/{matter['id']}").json()
+    assert totals["total_hours"] == 1.5
+    assert totals["total_billable"] == 150
+    assert rollups.verify(db) == []
+
+def test_invoicing_keeps_rollups_consistent(client, db, make_matter, add_entry):
+    matter = make_matter("Laskutus")
+    ids = [add_entry(matter["id"], hours=h)["id"] for h in (1, 2)]
+    assert client.post("/api/invoices", json={"matter_id": matter["id"], "time_entry_ids": ids}).status_code == 200
+    assert rollups.verify(db) == []
+
+def test_verify_reports_drift(db, make_matter, add_entry):
+    matter = make_matter("Drift")
+    add_entry(matter["id"], hours=3)
+    stored = db.get(rollups.MatterTotal, matter["id"])
+    stored.total_hours += 1
+    db.commit()
+    drift = rollups.verify(db)
+    assert {"matter_id": matter["id"], "column": "total_hours", "stored": 4, "expected": 3} in drift
+    rollups.rebuild_matters(db, [matter["id"]])
+    db.commit()
+    assert rollups.verify(db) == []
@@ -0,0 +1,33 @@
+from datetime import date
+
+from sqlalchemy import delete
+
+import sequences
+from models import Client, Matter, NumberSequence
+
+def test_matter_references_are_consecutive(make_matter):
+    first, second = make_matter("Numerointi 1"), make_matter("Numerointi 2")
+    prefix, number = first["reference"].rsplit("-", 1)
+    assert prefix == f"KH-{date.today().year}"
+    assert second["reference"] == f"{prefix}-{int(number) + 1:03d}"
+
+def test_counters_are_per_year(db):
+    assert sequences.next_numbers(db, "invoice", 2001, 3) == ["INV-2001-0001", "INV-2001-0002", "INV-2001-0003"]
+    assert sequences.next_number(db, "invoice", 2002) == "INV-2002-0001"
+    assert sequences.next_number(db, "invoice", 2001) == "INV-2001-0004"
+    db.rollback()
+    assert sequences.next_number(db, "invoice", 2001) == "INV-2001-0001"  # Rolled back numbers are reused
+    db.rollback()
+
+def test_seed_continues_after_highest_existing_number(db):
+    client = Client(name="Siemen Oy")
+    db.add(client)
+    db.flush()
+    for reference in ("KH-1999-9", "KH-1999-041", "KH-1998-700"):
+        db.add(Matter(title=reference, client_id=client.id, reference=reference, opened_date=date(1999, 1, 1)))
+    db.flush()
+    db.execute(delete(NumberSequence).where(NumberSequence.year.in_([1998, 1999])))
+    sequences.seed_from_existing(db.connection())
+    assert sequences.next_number(db, "matter", 1999) == "KH-1999-042"
+    assert sequences.next_number(db, "matter", 1998) == "KH-1998-701"
+    db.rollback()
@@ -0,0 +1,32 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import serializers
+from schemas import TimeEntryResponse
+
+ROW = (7, date(2024, 3, 15), 1.5, "Työ", True, 250.0, 42, False, None)
+
+@pytest.mark.parametrize("fast", [True, False])
+@pytest.mark.parametrize("created_at", [
+    datetime(2024, 3, 15, 9, 30, 15, 123456, tzinfo=timezone.utc),
+    datetime(2024, 3, 15, 11, 30, 15, tzinfo=timezone(timedelta(hours=2))),
+    datetime(2024, 3, 15, 9, 30, 15),
+])
+def test_fast_path_matches_pydantic(monkeypatch, fast, created_at):
+    if not fast:
+        monkeypatch.setattr(serializers, "orjson", None)
+    elif serializers.orjson is None:
+        pytest.skip("orjson is not installed")
+    entry = serializers.time_entry_dict(ROW + (created_at,))
+    expected = TimeEntryResponse(**entry).model_dump_json()
+    assert serializers.dumps([entry]) == f"[{expected}]".encode("utf-8")
+
+def test_create_returns_the_full_entry(client, make_matter, add_entry):
+    matter = make_matter()
+    entry = add_entry(matter["id"], hours=2, rate=200)
+    assert "_sa_instance_state" not in entry
+    assert entry["amount"] == 400
+    assert entry["billed"] is False and entry["invoice_id"] is None
+    listed = client.get("/api/time-entries", params={"matter_id": matter["id"]}).json()
+    assert listed == [entry]
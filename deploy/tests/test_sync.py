@@ -0,0 +1,87 @@
+from sqlalchemy import delete, func, select
+
+import changes
+from models import ChangeLogEntry, Client, NumberSequence
+
+def sync_all(client, since, limit=1000):
+    """Follow `more` to the end; returns (pages, final token)"""
+    pages = []
+    while True:
+        page = client.get("/api/sync", params={"since": since, "limit": limit}).json()
+        assert page["token"] >= since
+        pages.append(page)
+        since = page["token"]
+        if not page["more"]:
+            return pages, since
+
+def test_changes_and_tombstones(client, make_matter, add_entry):
+    token = client.get("/api/bootstrap").json()["sync_token"]
+    matter = make_matter("Synkronointi")
+    kept, removed = add_entry(matter["id"]), add_entry(matter["id"], hours=2)
+    assert client.delete(f"/api/time-entries/{removed['id']}").status_code == 200
+
+    pages, new_token = sync_all(client, token)
+    assert new_token > token
+    page = pages[-1]
+    assert [e["id"] for e in page["time_entries"]] == [kept["id"]]
+    assert page["deleted"]["time_entries"] == [removed["id"]]
+    assert [m["id"] for m in page["matters"]] == [matter["id"]]
+    assert page["matters"][0]["total_hours"] == 1.5  # Matter totals moved by the entries are resent
+    assert page["dashboard"] is not None
+
+    page = client.get("/api/sync", params={"since": new_token}).json()
+    assert page["token"] == new_token and not page["more"] and page["time_entries"] == []
+
+def test_paging_returns_every_change_once(client, make_matter, add_entry):
+    token = client.get("/api/bootstrap").json()["sync_token"]
+    matter = make_matter("Sivutettu synkronointi")
+    ids = {add_entry(matter["id"])["id"] for _ in range(5)}
+    pages, _ = sync_all(client, token, limit=2)
+    assert len(pages) > 2
+    seen = [e["id"] for page in pages for e in page["time_entries"]]
+    assert set(seen) == ids and len(seen) == len(ids)
+
+def test_bulk_paths_are_logged(client, make_matter):
+    matter = make_matter("Massatuonti")
+    token = client.get("/api/bootstrap").json()["sync_token"]
+    report = client.post("/api/time-entries/bulk", json={"entries": [
+        {"matter_id": matter["id"], "date": "2024-05-02", "hours": 1, "description": "Tuotu"},
+    ]}).json()
+    page = client.get("/api/sync", params={"since": token}).json()
+    assert [e["id"] for e in page["time_entries"]] == report["ids"]
+    assert [m["id"] for m in page["matters"]] == [matter["id"]]
+
+def test_log_is_written_at_commit_and_dropped_on_rollback(db):
+    before = changes.current_token(db)
+    db.add(Client(name="Keskeneräinen Oy"))
+    db.flush()
+    assert db.scalar(select(func.count()).where(ChangeLogEntry.id > before)) == 0
+    db.rollback()
+
+    db.add(Client(name="Valmis Oy"))
+    db.commit()
+    assert changes.current_token(db) == before + 1
+    assert db.scalar(select(NumberSequence.last_value).where(NumberSequence.name == changes.COUNTER[0])) == before + 1
+
+def test_compact_keeps_latest_entries_and_tombstones(client, db, make_matter, add_entry):
+    matter = make_matter("Tiivistys")
+    entry = add_entry(matter["id"])
+    client.patch(f"/api/matters/{matter['id']}", json={"description": "Päivitetty"})
+    gone = add_entry(matter["id"])
+    client.delete(f"/api/time-entries/{gone['id']}")
+    before, _ = sync_all(client, 0)
+
+    assert changes.compact(db) > 0
+    after, _ = sync_all(client, 0)
+    def state(pages):
+        return ({e["id"] for p in pages for e in p["time_entries"]}, {i for p in pages for i in p["deleted"]["time_entries"]})
+    assert state(after) == state(before)
+    assert entry["id"] in state(after)[0] and gone["id"] in state(after)[1]
+
+def test_counter_is_seeded_after_existing_entries(db):
+    name, year = changes.COUNTER
+    highest = changes.current_token(db)
+    db.execute(delete(NumberSequence).where(NumberSequence.name == name))
+    changes.seed_counter(db.connection())
+    assert db.get(NumberSequence, (name, year)).last_value == highest
+    db.rollback()
@@ -0,0 +1,23 @@
+import storage
+from models import Document, StoredBlob
+
+def upload(client, matter_id, content, name="liite.txt"):
+    return client.post(f"/api/matters/{matter_id}/documents", files={"file": (name, content, "text/plain")})
+
+def test_default_limit_fits_large_evidence_files():
+    assert storage.MAX_UPLOAD_BYTES >= 200 * 1024 * 1024
+
+def test_same_bytes_share_one_blob(client, db, make_matter):
+    content = b"Todiste, sama tiedosto kahdessa asiassa"
+    first = upload(client, make_matter("Blob 1")["id"], content).json()
+    second = upload(client, make_matter("Blob 2")["id"], content).json()
+    blob = db.get(StoredBlob, db.get(Document, first["id"]).content_hash)
+    assert blob.ref_count == 2
+    assert client.delete(f"/api/documents/{second['id']}").status_code == 200
+    db.expire_all()
+    assert db.get(StoredBlob, blob.content_hash).ref_count == 1
+
+def test_upload_over_limit_is_rejected(client, make_matter, monkeypatch):
+    monkeypatch.setattr(storage, "MAX_UPLOAD_BYTES", 10)
+    response = upload(client, make_matter("Liian suuri")["id"], b"x" * 11)
+    assert response.status_code == 413